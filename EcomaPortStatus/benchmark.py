@@ -0,0 +1,274 @@
+"""Benchmark the health probe strategies against a fleet of local stub actuator servers.
+
+    python benchmark.py --servers 200 --closed 50 --latency uniform:5,50 --hang 0.01 --reset 0.01 --down 0.1
+
+starts the stubs on loopback in a child process, sweeps them with every strategy and writes the
+results to a JSON file (bench_results.json by default).
+"""
+import gc
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import struct
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+import multiprocessing
+from healthprobe import STATES, ConnectionPool, HealthSweep
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+UP_BODY = json.dumps({"status": "UP", "components": {
+    "db": {"status": "UP", "details": {"database": "PostgreSQL"}},
+    "diskSpace": {"status": "UP", "details": {"total": 499963174912, "free": 91373096960, "threshold": 10485760}},
+    "ping": {"status": "UP"},
+}}).encode()
+DOWN_BODY = json.dumps({"status": "DOWN", "components": {
+    "db": {"status": "DOWN", "details": {"error": "org.springframework.jdbc.CannotGetJdbcConnectionException"}},
+    "diskSpace": {"status": "UP", "details": {"total": 499963174912, "free": 91373096960, "threshold": 10485760}},
+    "ping": {"status": "UP"},
+}}).encode()
+
+
+def latency_sampler(spec, rng):
+    """Build a function returning response delays in seconds from a spec such as
+    fixed:20, uniform:5,50, exp:20 or lognormal:3,0.5 (all in milliseconds, lognormal mu/sigma of ln ms)."""
+    kind, _, values = spec.partition(":")
+    numbers = [float(value) for value in values.split(",") if value]
+    if kind == "fixed":
+        return lambda: numbers[0] / 1000
+    if kind == "uniform":
+        return lambda: rng.uniform(numbers[0], numbers[1]) / 1000
+    if kind == "exp":
+        return lambda: rng.expovariate(1 / numbers[0]) / 1000
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(numbers[0], numbers[1]) / 1000
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+async def run_fleet(count, options, connection):
+    """Serve count stub actuators until the parent sends anything on connection."""
+    rng = random.Random(options["seed"])
+    delay = latency_sampler(options["latency"], rng)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                roll = rng.random()
+                if roll < options["hang"]:
+                    # Accept the request and never answer; wait for the client to give up
+                    await reader.read()
+                    return
+                if roll < options["hang"] + options["reset"]:
+                    # SO_LINGER 0 turns the close into a TCP RST
+                    writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    writer.transport.abort()
+                    return
+                await asyncio.sleep(delay())
+                down = rng.random() < options["down"]
+                body = DOWN_BODY if down else UP_BODY
+                status = b"503 Service Unavailable" if down else b"200 OK"
+                writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Type: application/vnd.spring-boot.actuator.v3+json\r\n"
+                             b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, asyncio.CancelledError):
+            # CancelledError: idle keep-alive connections still open when the fleet shuts down
+            pass
+        finally:
+            writer.close()
+
+    servers = [await asyncio.start_server(handle, "127.0.0.1", 0, backlog=256) for _ in range(count)]
+    connection.send([server.sockets[0].getsockname()[1] for server in servers])
+    await asyncio.get_running_loop().run_in_executor(None, connection.recv)
+    for server in servers:
+        server.close()
+
+
+def serve_fleet(count, options, connection):
+    """Child process entry point."""
+    asyncio.run(run_fleet(count, options, connection))
+
+
+def closed_ports(count):
+    """Find ports with nothing listening by binding to port 0 and letting go again."""
+    ports = []
+    for _ in range(count):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            ports.append(sock.getsockname()[1])
+    return ports
+
+
+def curl_sweep(ports, args):
+    """The original strategy: one curl process per port, one after another."""
+    counts = dict.fromkeys(STATES, 0)
+    for port in ports:
+        try:
+            result = subprocess.run(["curl", "-s", "--max-time", str(args.connect_timeout + args.read_timeout),
+                                     f"http://127.0.0.1:{port}{args.context_path}"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        except OSError:
+            counts["DOWN"] += 1
+            continue
+        if result.returncode == 7:
+            counts["CLOSED"] += 1
+        elif result.returncode == 28:
+            counts["TIMEOUT"] += 1
+        elif '"status":"UP"' in result.stdout.replace(" ", ""):
+            counts["UP"] += 1
+        else:
+            counts["DOWN"] += 1
+    return counts
+
+
+def engine_sweep(ports, args, max_workers, pool, tcp_timeout=None):
+    """Sweep with the in-process HealthSweep engine."""
+    sweep = HealthSweep([("http", "127.0.0.1")], ports, args.context_path, max_workers, max_workers,
+                        args.connect_timeout, args.read_timeout, args.deadline, log=lambda message: None, pool=pool,
+                        tcp_timeout=tcp_timeout)
+    return sweep.run()
+
+
+def build_strategies(args):
+    """Map strategy names to functions taking the port list and returning state counts."""
+    keepalive_pool = ConnectionPool(max_per_host=args.concurrency)
+    strategies = {
+        "serial": lambda ports: engine_sweep(ports, args, 1, None),
+        "concurrent": lambda ports: engine_sweep(ports, args, args.concurrency, None),
+        # The pool outlives the rounds, so rounds after the first measure warm keep-alive connections
+        "concurrent-keepalive": lambda ports: engine_sweep(ports, args, args.concurrency, keepalive_pool),
+        "tcp-fastpath": lambda ports: engine_sweep(ports, args, args.concurrency, None, args.tcp_timeout),
+    }
+    if shutil.which("curl"):
+        strategies["curl"] = lambda ports: curl_sweep(ports, args)
+    return strategies
+
+
+def max_rss_kb(who):
+    """Peak resident set size in KB of this process (RUSAGE_SELF) or its largest waited-for child (RUSAGE_CHILDREN)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def measure(strategy, ports, rounds):
+    """Time the strategy over several rounds, then run it once more under tracemalloc for peak memory."""
+    walls = []
+    counts = {}
+    for _ in range(rounds):
+        gc.collect()
+        started = time.perf_counter()
+        counts = strategy(ports)
+        walls.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    strategy(ports)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(walls)
+    return {
+        "wall_s": [round(wall, 4) for wall in walls],
+        "wall_median_s": round(median, 4),
+        "probes": len(ports),
+        "probes_per_s": round(len(ports) / median, 1) if median else None,
+        "states": counts,
+        "python_peak_kb": peak // 1024,
+        "max_rss_kb": max_rss_kb(resource.RUSAGE_SELF) if resource else None,
+        # The curl processes; zero for the in-process strategies
+        "child_max_rss_kb": max_rss_kb(resource.RUSAGE_CHILDREN) if resource else None,
+    }
+
+
+def measure_child(name, ports, args, connection):
+    """Child process entry point: measure one strategy, so the peak RSS is that strategy's alone."""
+    connection.send(measure(build_strategies(args)[name], ports, args.rounds))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark health probe strategies against local stub actuators.")
+    parser.add_argument("--servers", type=int, default=100, help="number of stub actuator servers")
+    parser.add_argument("--closed", type=int, default=0, help="extra ports with nothing listening")
+    parser.add_argument("--latency", default="uniform:5,50", help="fixed:MS, uniform:MIN,MAX, exp:MEAN or lognormal:MU,SIGMA")
+    parser.add_argument("--hang", type=float, default=0.0, help="probability a request is never answered")
+    parser.add_argument("--reset", type=float, default=0.0, help="probability a request gets a TCP reset")
+    parser.add_argument("--down", type=float, default=0.0, help="probability a response reports DOWN")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--strategies", default="", help="comma separated subset to run, default all")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--connect-timeout", type=float, default=1.0)
+    parser.add_argument("--read-timeout", type=float, default=1.0)
+    parser.add_argument("--deadline", type=float, default=120.0)
+    parser.add_argument("--tcp-timeout", type=float, default=0.5, help="TCP stage timeout of the tcp-fastpath strategy")
+    parser.add_argument("--context-path", default="/api/actuator/health")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    try:
+        latency_sampler(args.latency, random.Random())
+    except (ValueError, IndexError) as e:
+        parser.error(str(e))
+
+    strategies = build_strategies(args)
+    if args.strategies:
+        selected = [name.strip() for name in args.strategies.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in strategies]
+        if unknown:
+            parser.error(f"unknown or unavailable strategies: {', '.join(unknown)}")
+        strategies = {name: strategies[name] for name in selected}
+
+    options = {"latency": args.latency, "hang": args.hang, "reset": args.reset, "down": args.down, "seed": args.seed}
+    # ru_maxrss never goes down, so every strategy runs in a fresh process of its own
+    spawn = multiprocessing.get_context("spawn")
+    parent_end, child_end = multiprocessing.Pipe()
+    fleet = multiprocessing.Process(target=serve_fleet, args=(args.servers, options, child_end), daemon=True)
+    fleet.start()
+    try:
+        ports = parent_end.recv() + closed_ports(args.closed)
+        results = {}
+        for name in strategies:
+            print(f"{name}: {len(ports)} probes x {args.rounds} rounds...", file=sys.stderr, flush=True)
+            result_end, measure_end = spawn.Pipe()
+            runner = spawn.Process(target=measure_child, args=(name, ports, args, measure_end))
+            runner.start()
+            try:
+                results[name] = result_end.recv()
+            except EOFError:
+                runner.join()
+                raise SystemExit(f"{name}: the measuring process died with exit code {runner.exitcode}")
+            runner.join()
+            print(f"{name}: median {results[name]['wall_median_s']}s, {results[name]['probes_per_s']} probes/s, "
+                  f"peak {results[name]['python_peak_kb']} KB", file=sys.stderr, flush=True)
+    finally:
+        parent_end.send("stop")
+        fleet.join(timeout=5)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
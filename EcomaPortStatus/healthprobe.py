@@ -0,0 +1,867 @@
+"""Qt-free health probe engine shared by the Port Status Checker window and the command line.
+
+    python healthprobe.py --hosts http://10.2.6.74 --port-prefix 81 --port-range 3,7
+
+streams one NDJSON record per probe to stdout and exits 0 when every target is UP, 1 otherwise.
+"""
+import sys
+import json
+import math
+import errno
+import time
+import heapq
+import random
+import select
+import socket
+import selectors
+import argparse
+import threading
+import ipaddress
+import http.client
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+# Refuse plans bigger than this so a typo like 10.0.0.0/8 doesn't try to queue millions of probes
+MAX_PLAN_SIZE = 100000
+
+# One host:port pair to probe. address is the resolved IP, host is what the user typed (used for Host/TLS)
+ProbeTarget = namedtuple("ProbeTarget", ["label", "scheme", "host", "address", "port"])
+
+# Parsed actuator health response: overall status, {component path: status} and a fingerprint of the raw body
+HealthReport = namedtuple("HealthReport", ["status", "components", "fingerprint"])
+
+# Every state a ProbeResult can carry: CLOSED means refused, FILTERED means no TCP answer at all
+STATES = ("UP", "DOWN", "TIMEOUT", "CLOSED", "FILTERED")
+
+# Outcome of one probe. state is one of STATES, timings is None when no HTTP response came back
+ProbeResult = namedtuple("ProbeResult", ["label", "state", "detail", "changes", "timings"])
+
+# Resolved addresses by hostname, shared across sweeps so each name is only looked up once
+resolved_hosts = {}
+
+
+def build_full_port(port_prefix, port):
+    """Join the port prefix and a range number, zero padding single digits (81 + 3 -> 8103)."""
+    port = str(port)
+    if len(port) == 2:
+        return f"{port_prefix}{port}"
+    return f"{port_prefix}0{port}"
+
+
+def prefix_ports(port_prefix, port_start, port_end):
+    """Expand the prefix and range fields into port numbers (81, 3..7 -> 8103..8107)."""
+    return parse_ports(",".join(build_full_port(port_prefix, i) for i in range(port_start, port_end + 1)))
+
+
+def parse_ports(text):
+    """Parse a port list such as "8080, 9000-9005" into a sorted list of unique port numbers."""
+    ports = set()
+    for item in text.replace(";", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "-" in item:
+            start, end = (int(value) for value in item.split("-", 1))
+        else:
+            start = end = int(item)
+        if not 0 < start <= end <= 65535:
+            raise ValueError(f"invalid port or range: {item}")
+        ports.update(range(start, end + 1))
+    return sorted(ports)
+
+
+def parse_hosts(text):
+    """Parse comma separated hosts, urls and CIDR blocks into a list of (scheme, host) pairs.
+
+    CIDR blocks are expanded to their usable addresses, duplicates are dropped and order is kept.
+    """
+    hosts = []
+    seen = set()
+    for item in text.replace(";", ",").replace(" ", ",").split(","):
+        item = item.strip().rstrip("/")
+        if not item:
+            continue
+        scheme = "http"
+        if "://" in item:
+            scheme, item = item.split("://", 1)
+            scheme = scheme.lower()
+        if "/" in item:
+            network = ipaddress.ip_network(item, strict=False)
+            # A /32 (or /128) has no "hosts" in ipaddress terms, so fall back to the address itself
+            names = [str(address) for address in network.hosts()] or [str(network.network_address)]
+        else:
+            names = [item]
+        for name in names:
+            if (scheme, name) not in seen:
+                seen.add((scheme, name))
+                hosts.append((scheme, name))
+    return hosts
+
+
+def collect_components(node, prefix, components):
+    """Flatten nested actuator components into {"db": "UP", "composite.redis": "DOWN", ...}."""
+    # Boot 2.2+ nests under "components", 2.0/2.1 under "details", 1.x puts them next to "status"
+    children = node.get("components")
+    if not isinstance(children, dict):
+        children = node.get("details") if isinstance(node.get("details"), dict) else node
+    for name, child in children.items():
+        if not isinstance(child, dict) or "status" not in child:
+            continue
+        path = f"{prefix}{name}"
+        components[path] = str(child["status"])
+        collect_components(child, f"{path}.", components)
+    return components
+
+
+def parse_health(body):
+    """Parse a Spring Boot actuator health body into a HealthReport, raising ValueError if it isn't one."""
+    document = json.loads(body)
+    if not isinstance(document, dict) or "status" not in document:
+        raise ValueError("not an actuator health response")
+    return HealthReport(str(document["status"]), collect_components(document, "", {}), hash(body))
+
+
+def diff_components(previous, current):
+    """Return "name: OLD -> NEW" lines for every component whose status changed, appeared or vanished."""
+    changes = []
+    for name, status in current.items():
+        old = previous.get(name)
+        if old != status:
+            changes.append(f"{name}: {old or 'NEW'} -> {status}")
+    for name in previous.keys() - current.keys():
+        changes.append(f"{name}: {previous[name]} -> GONE")
+    return changes
+
+
+def format_result(result):
+    """Render a ProbeResult as one console line."""
+    parts = []
+    if result.timings:
+        timings = result.timings
+        parts.append(f"{timings['total'] * 1000:.0f} ms: dns {timings['dns'] * 1000:.0f}, connect {timings['connect'] * 1000:.0f}, "
+                     f"first byte {timings['first_byte'] * 1000:.0f}")
+    if result.detail:
+        parts.append(result.detail)
+    line = f"{result.label}: {result.state}"
+    if parts:
+        line = f"{line} ({', '.join(parts)})"
+    if result.changes:
+        line = f"{line} [{', '.join(result.changes)}]"
+    return line
+
+
+def resolve_host(host):
+    """Resolve a hostname to an IP address, caching the answer for the lifetime of the process."""
+    address = resolved_hosts.get(host)
+    if address is None:
+        address = resolved_hosts[host] = socket.gethostbyname(host)
+    return address
+
+
+def build_probe_plan(hosts, ports):
+    """Resolve every host once and expand hosts x ports into a deduplicated list of ProbeTargets.
+
+    Returns (targets, errors) where errors holds one message per host that could not be resolved.
+    """
+    if len(hosts) * len(ports) > MAX_PLAN_SIZE:
+        raise ValueError(f"plan has {len(hosts) * len(ports)} probes, the limit is {MAX_PLAN_SIZE}")
+
+    targets = []
+    errors = []
+    seen = set()
+    for scheme, host in hosts:
+        try:
+            address = resolve_host(host)
+        except OSError as e:
+            errors.append(f"{host}: DOWN (Exception: cannot resolve host: {e})")
+            continue
+        for port in ports:
+            # Two names for the same machine (e.g. localhost and 127.0.0.1) are only probed once
+            if (scheme, address, port) in seen:
+                continue
+            seen.add((scheme, address, port))
+            targets.append(ProbeTarget(f"{host}:{port}", scheme, host, address, port))
+    return targets, errors
+
+
+class ConnectionPool:
+    """Keeps idle keep-alive connections per host:port so repeated probes skip the TCP/TLS handshake.
+
+    At most max_per_host connections per host:port are open at once. Idle connections are dropped
+    once they have been unused for idle_timeout seconds or the server has closed them.
+    """
+
+    EVICT_INTERVAL = 1.0  # Seconds between sweeps over all idle connections
+
+    def __init__(self, max_per_host=8, idle_timeout=15.0):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle = {}  # key -> list of (connection, released_at)
+        self.slots = {}  # key -> semaphore bounding open connections
+        self.last_evicted = time.monotonic()
+
+    def slot(self, key):
+        """Return the semaphore that limits concurrent connections to one host:port."""
+        with self.lock:
+            return self.slots.setdefault(key, threading.BoundedSemaphore(self.max_per_host))
+
+    @staticmethod
+    def is_alive(connection):
+        """An idle socket that has become readable was closed (or written to) by the server, so it can't be reused."""
+        if connection.sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([connection.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def take(self, key):
+        """Pop the most recently used live connection for key, or None if there isn't one."""
+        now = time.monotonic()
+        with self.lock:
+            idle = self.idle.get(key, [])
+            while idle:
+                connection, released_at = idle.pop()
+                if now - released_at < self.idle_timeout and self.is_alive(connection):
+                    return connection
+                connection.close()
+        return None
+
+    def put(self, key, connection):
+        """Return a connection to the pool for reuse."""
+        now = time.monotonic()
+        with self.lock:
+            self.idle.setdefault(key, []).append((connection, now))
+            if now - self.last_evicted >= self.EVICT_INTERVAL:
+                self.last_evicted = now
+                self.evict_expired(now)
+
+    def evict_expired(self, now):
+        """Close idle connections past idle_timeout. Caller holds the lock."""
+        for key, idle in self.idle.items():
+            keep = []
+            for connection, released_at in idle:
+                if now - released_at < self.idle_timeout:
+                    keep.append((connection, released_at))
+                else:
+                    connection.close()
+            self.idle[key] = keep
+
+    def close_all(self):
+        """Close every idle connection."""
+        with self.lock:
+            for idle in self.idle.values():
+                for connection, _ in idle:
+                    connection.close()
+            self.idle = {}
+
+
+def tcp_check(endpoints, timeout, max_open=256, per_address=None, deadline=None, on_answer=None):
+    """Try a plain TCP connect to every (address, port) and classify each as OPEN, CLOSED or FILTERED.
+
+    Uses non-blocking sockets on one selector, so the whole check costs one thread. At most max_open
+    connects are pending at once and at most per_address of them to one address, started round-robin
+    across the addresses and topped up as answers come in; each connect gets timeout seconds. Past
+    deadline (a time.monotonic() value) nothing more is started and every endpoint without an answer
+    is TIMEOUT. on_answer(endpoint, state) is called as each answer comes in. The sockets are closed
+    straight away; only the answer matters.
+    """
+    results = {}
+    queues = {}
+    for endpoint in dict.fromkeys(endpoints):
+        queues.setdefault(endpoint[0], deque()).append(endpoint)
+    rotation = deque(queues)
+    pending = dict.fromkeys(queues, 0)
+    per_address = per_address or max_open
+    deadline = math.inf if deadline is None else deadline
+    selector = selectors.DefaultSelector()
+
+    def answer(endpoint, state):
+        results[endpoint] = state
+        if on_answer:
+            on_answer(endpoint, state)
+
+    def finish(key, state):
+        pending[key.data[0][0]] -= 1
+        selector.unregister(key.fileobj)
+        key.fileobj.close()
+        answer(key.data[0], state)
+
+    def start_connects():
+        """Start one connect per address in turn until max_open are pending or every address is at its cap."""
+        started = True
+        while started and len(selector.get_map()) < max_open and time.monotonic() < deadline:
+            started = False
+            for _ in range(len(rotation)):
+                if not rotation:
+                    return
+                address = rotation[0]
+                if not queues[address]:
+                    rotation.popleft()
+                    continue
+                rotation.rotate(-1)
+                if pending[address] >= per_address:
+                    continue
+                endpoint = queues[address].popleft()
+                started = True
+                sock = socket.socket(socket.AF_INET6 if ":" in address else socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                error = sock.connect_ex(endpoint)
+                if error in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, "WSAEWOULDBLOCK", -1)):
+                    selector.register(sock, selectors.EVENT_WRITE, (endpoint, time.monotonic() + timeout))
+                    pending[address] += 1
+                    if len(selector.get_map()) >= max_open:
+                        return
+                else:
+                    sock.close()
+                    answer(endpoint, connect_state(error))
+
+    try:
+        start_connects()
+        while selector.get_map():
+            expiry = min(min(key.data[1] for key in selector.get_map().values()), deadline)
+            for key, _ in selector.select(max(0.0, expiry - time.monotonic())):
+                finish(key, connect_state(key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)))
+
+            # Whatever hasn't answered in time is dropping our SYNs, unless the scan deadline cut it short
+            now = time.monotonic()
+            for key in list(selector.get_map().values()):
+                if key.data[1] <= now:
+                    finish(key, "FILTERED")
+                elif deadline <= now:
+                    finish(key, "TIMEOUT")
+            start_connects()
+        for queue in queues.values():
+            while queue:
+                answer(queue.popleft(), "TIMEOUT")
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+    return results
+
+
+def connect_state(error):
+    """OPEN, CLOSED or FILTERED for the errno a non-blocking connect ended with."""
+    if error == 0:
+        return "OPEN"
+    if error in (errno.ETIMEDOUT, errno.EHOSTUNREACH, errno.ENETUNREACH):
+        return "FILTERED"
+    return "CLOSED"
+
+
+# Shared by every sweep and watch loop so connections survive from one run to the next
+connection_pool = ConnectionPool()
+
+
+def probe_health(url, connect_timeout=None, read_timeout=None, address=None, pool=None, timings=None):
+    """Send a GET to the health url in-process and return (status code, body text).
+
+    connect_timeout bounds the TCP (and TLS) handshake, read_timeout bounds every socket read after that.
+    address, when given, is dialled instead of resolving the url host again (plain http only, so TLS
+    certificate checks still see the real hostname). With a pool the connection is kept alive and reused.
+    timings, when given, is filled with the dns, connect, first_byte and total phase durations in seconds
+    (dns and connect stay 0 when the address was already known or a pooled connection was reused).
+    """
+    started = time.perf_counter()
+    if timings is None:
+        timings = {}
+    timings.update(dns=0.0, connect=0.0, first_byte=0.0, total=0.0)
+
+    if "://" not in url:
+        url = f"http://{url}"
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+
+    if address is None and parts.scheme != "https":
+        address = resolve_host(parts.hostname)
+        timings["dns"] = time.perf_counter() - started
+
+    headers = {"Accept": "application/json"}
+    if address and parts.scheme != "https":
+        headers["Host"] = parts.netloc
+
+    def open_connection():
+        connect_started = time.perf_counter()
+        connection = connection_class(parts.hostname, parts.port, timeout=connect_timeout)
+        if "Host" in headers:
+            connection.host = address
+        connection.connect()
+        timings["connect"] = time.perf_counter() - connect_started
+        return connection
+
+    def send(connection):
+        connection.sock.settimeout(read_timeout)
+        sent = time.perf_counter()
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        timings["first_byte"] = time.perf_counter() - sent
+        body = response.read().decode("utf-8", errors="replace")
+        timings["total"] = time.perf_counter() - started
+        return response.status, body, not response.will_close
+
+    if pool is None:
+        connection = open_connection()
+        try:
+            status, body, _ = send(connection)
+            return status, body
+        finally:
+            connection.close()
+
+    key = (parts.scheme, address or parts.hostname, parts.port)
+    slot = pool.slot(key)
+    if not slot.acquire(timeout=connect_timeout):
+        raise socket.timeout(f"no free connection to {parts.netloc}")
+    connection = None
+    try:
+        connection = pool.take(key)
+        if connection is not None:
+            try:
+                status, body, reusable = send(connection)
+            except (ConnectionError, http.client.BadStatusLine):
+                # The server dropped the kept-alive connection between probes; retry once on a fresh one
+                connection.close()
+                connection = None
+        if connection is None:
+            connection = open_connection()
+            status, body, reusable = send(connection)
+
+        if reusable:
+            pool.put(key, connection)
+        else:
+            connection.close()
+        return status, body
+    except Exception:
+        if connection is not None:
+            connection.close()
+        raise
+    finally:
+        slot.release()
+
+
+class LatencyHistory:
+    """Fixed-size ring buffer of probe latencies in milliseconds for one target.
+
+    Samples live in a flat float array, so a long-running watch keeps a few hundred bytes per port.
+    """
+
+    SPARK_CHARS = "\u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"
+
+    def __init__(self, size=120):
+        self.samples = array("f", [0.0]) * size
+        self.size = size
+        self.count = 0
+        self.position = 0
+
+    def add(self, value):
+        """Record one latency sample, overwriting the oldest once the buffer is full."""
+        self.samples[self.position] = value
+        self.position = (self.position + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def values(self):
+        """Return the stored samples, oldest first."""
+        if self.count < self.size:
+            return self.samples[:self.count].tolist()
+        return (self.samples[self.position:] + self.samples[:self.position]).tolist()
+
+    def percentile(self, fraction):
+        """Nearest-rank percentile of the stored samples (fraction 0.95 -> p95), or None when empty."""
+        ordered = sorted(self.values())
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+    def sparkline(self, width=30):
+        """Render the most recent samples as a row of block characters scaled between their min and max."""
+        recent = self.values()[-width:]
+        if not recent:
+            return ""
+        low, high = min(recent), max(recent)
+        span = (high - low) or 1.0
+        top = len(self.SPARK_CHARS) - 1
+        return "".join(self.SPARK_CHARS[round((value - low) / span * top)] for value in recent)
+
+    def summary(self):
+        """One line with p50/p95/p99 and the sparkline."""
+        p50, p95, p99 = (self.percentile(fraction) for fraction in (0.50, 0.95, 0.99))
+        return f"p50 {p50:.0f} ms, p95 {p95:.0f} ms, p99 {p99:.0f} ms {self.sparkline()}"
+
+
+class HealthSweep:
+    """Probes every host:port of the plan once.
+
+    log receives console messages and on_result every ProbeResult, both from the calling thread.
+    """
+
+    def __init__(self, hosts, ports, context_path, max_workers=16, per_host_limit=4,
+                 connect_timeout=2.0, read_timeout=5.0, scan_deadline=30.0, health_reports=None,
+                 log=print, on_result=None, pool=connection_pool, tcp_timeout=0.5, tcp_per_host_limit=128):
+        self.log = log
+        self.on_result = on_result or (lambda result: None)
+        self.hosts = hosts
+        self.ports = ports
+        self.context_path = context_path
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.scan_deadline = scan_deadline
+        # Last HealthReport per target label, handed in by the window so component diffs span sweeps
+        self.health_reports = {} if health_reports is None else health_reports
+        self.plan_errors = []
+        # Keep-alive pool, or None to open a fresh connection for every probe
+        self.pool = pool
+        # Timeout of the TCP reachability stage run before any HTTP request, or None to skip that stage
+        self.tcp_timeout = tcp_timeout
+        # Pending SYNs per host in that stage; a bare connect costs the host far less than an HTTP probe
+        self.tcp_per_host_limit = max(1, tcp_per_host_limit)
+        self.probe_started = {}
+
+    def plan_targets(self):
+        """Build the probe plan, reporting hosts that failed to resolve straight to the log."""
+        targets, errors = build_probe_plan(self.hosts, self.ports)
+        self.plan_errors = errors
+        for message in errors:
+            self.log(message)
+        return targets
+
+    def read_report(self, label, body):
+        """Parse the body into a HealthReport and diff its components against the previous one.
+
+        An identical body to last time is recognised by its fingerprint and neither parsed nor diffed again.
+        """
+        previous = self.health_reports.get(label)
+        if previous is not None and previous.fingerprint == hash(body):
+            return previous, []
+
+        report = parse_health(body)
+        self.health_reports[label] = report
+        if previous is None:
+            # First sighting: only mention the components that are not healthy
+            return report, [f"{name}: {status}" for name, status in report.components.items() if status != "UP"]
+        return report, diff_components(previous.components, report.components)
+
+    def probe_target(self, target):
+        """Probe a single target and return its ProbeResult."""
+        url = f"{target.scheme}://{target.host}:{target.port}{self.context_path}"
+        started = self.probe_started[target.label] = time.monotonic()
+        timings = {}
+        try:
+            _, body = probe_health(url, self.connect_timeout, self.read_timeout, target.address, self.pool, timings)
+
+            try:
+                report, changes = self.read_report(target.label, body)
+            except ValueError:
+                return ProbeResult(target.label, "DOWN", f"Response: {body.strip()[:200]}", [], timings)
+
+            if report.status == "UP":
+                return ProbeResult(target.label, "UP", "", changes, timings)
+            return ProbeResult(target.label, "DOWN", f"status {report.status}", changes, timings)
+
+        except socket.timeout as e:
+            return ProbeResult(target.label, "TIMEOUT", f"{e} after {time.monotonic() - started:.2f}s", [], None)
+        except ConnectionRefusedError:
+            return ProbeResult(target.label, "CLOSED", "connection refused", [], None)
+        except Exception as e:
+            return ProbeResult(target.label, "DOWN", f"Exception: {e}", [], None)
+
+    def reachable_targets(self, targets, counts, deadline):
+        """TCP stage: report closed and filtered targets as their answers come in and return the ones accepting connections."""
+        by_endpoint = {}
+        for target in targets:
+            by_endpoint.setdefault((target.address, target.port), []).append(target)
+        reachable = []
+        details = {"CLOSED": "connection refused", "FILTERED": f"no TCP answer within {self.tcp_timeout:g}s",
+                   "TIMEOUT": f"scan deadline of {self.scan_deadline:g}s reached in the TCP stage"}
+
+        def on_answer(endpoint, state):
+            for target in by_endpoint[endpoint]:
+                if state == "OPEN":
+                    reachable.append(target)
+                    continue
+                counts[state] += 1
+                self.on_result(ProbeResult(target.label, state, details[state], [], None))
+
+        tcp_check(list(by_endpoint), self.tcp_timeout, per_address=self.tcp_per_host_limit, deadline=deadline,
+                  on_answer=on_answer)
+        # Keep the plan order for the HTTP stage
+        order = {target.label: index for index, target in enumerate(targets)}
+        return sorted(reachable, key=lambda target: order[target.label])
+
+    def run(self):
+        targets = self.plan_targets()
+
+        scan_started = time.monotonic()
+        deadline = scan_started + self.scan_deadline
+        self.probe_started = {}
+        counts = dict.fromkeys(STATES, 0)
+
+        # Most ports in a range have nothing listening; find those with one cheap connect before any HTTP
+        if self.tcp_timeout and targets:
+            targets = self.reachable_targets(targets, counts, deadline)
+
+        # One queue per machine, served round-robin, so a host with many ports can't starve the others
+        queues = {}
+        for target in targets:
+            queues.setdefault(target.address, deque()).append(target)
+        rotation = deque(queues)
+        active = dict.fromkeys(queues, 0)
+        in_flight = {}
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def dispatch():
+            """Hand out free worker slots one host at a time, never exceeding per_host_limit."""
+            progressed = True
+            while progressed and len(in_flight) < self.max_workers:
+                progressed = False
+                for _ in range(len(rotation)):
+                    address = rotation[0]
+                    rotation.rotate(-1)
+                    if queues[address] and active[address] < self.per_host_limit:
+                        target = queues[address].popleft()
+                        active[address] += 1
+                        in_flight[executor.submit(self.probe_target, target)] = target
+                        progressed = True
+                        if len(in_flight) >= self.max_workers:
+                            break
+
+        try:
+            # Report each result as soon as it lands and refill the freed slot straight away
+            dispatch()
+            while in_flight:
+                done, _ = wait(in_flight, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    # Scan deadline hit: report whatever is still queued or in flight instead of waiting on it
+                    now = time.monotonic()
+                    unfinished = list(in_flight.values()) + [target for queue in queues.values() for target in queue]
+                    for target in unfinished:
+                        elapsed = now - self.probe_started.get(target.label, scan_started)
+                        counts["TIMEOUT"] += 1
+                        self.on_result(ProbeResult(target.label, "TIMEOUT", f"scan deadline of {self.scan_deadline:g}s reached after {elapsed:.2f}s", [], None))
+                    break
+                for future in done:
+                    target = in_flight.pop(future)
+                    active[target.address] -= 1
+                    result = future.result()
+                    counts[result.state] += 1
+                    self.on_result(result)
+                    # Component changes are rare, so they are logged as well as reported
+                    if result.changes:
+                        self.log(format_result(result))
+                dispatch()
+        finally:
+            # In-flight probes are bounded by their own socket timeouts, so don't block the caller on them
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        self.log(f"Sweep finished in {time.monotonic() - scan_started:.2f}s: "
+                 f"{', '.join(f'{count} {state}' for state, count in counts.items() if count or state == 'UP')}")
+        return counts
+
+
+class HealthWatch(HealthSweep):
+    """Keeps re-probing the targets until should_stop() returns True and only reports UP/DOWN transitions.
+
+    Healthy ports are polled every healthy_interval. Down ports start at down_interval and back off
+    exponentially up to max_down_interval, while ports that flapped recently stay at down_interval.
+    Every delay gets +/- jitter so probes don't hit the services in lockstep.
+    """
+
+    FLAP_WINDOW = 6  # Number of recent results looked at to decide whether a port is flapping
+    FLAP_TRANSITIONS = 2  # Transitions inside the window that mark a port as flapping
+    BUSY_RETRY = 0.05  # Delay before retrying a due probe whose host is already at per_host_limit
+
+    def __init__(self, *args, healthy_interval=10.0, down_interval=1.0, max_down_interval=8.0, jitter=0.2,
+                 should_stop=lambda: False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.should_stop = should_stop
+        self.healthy_interval = healthy_interval
+        self.down_interval = down_interval
+        self.max_down_interval = max_down_interval
+        self.jitter = jitter
+        self.port_states = {}
+
+    def next_delay(self, port_state):
+        """Work out how long to wait before probing a port again."""
+        history = port_state["history"]
+        transitions = sum(1 for previous, current in zip(history, list(history)[1:]) if previous != current)
+
+        if transitions >= self.FLAP_TRANSITIONS:
+            delay = self.down_interval
+        elif port_state["healthy"]:
+            delay = self.healthy_interval
+        else:
+            delay = min(self.max_down_interval, self.down_interval * 2 ** port_state["failures"])
+
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def record_result(self, result):
+        """Update the port state, log it if it or any component changed and return the delay until the next probe."""
+        label, state, detail, changes = result.label, result.state, result.detail, result.changes
+        healthy = state == "UP"
+        port_state = self.port_states.get(label)
+        stamp = time.strftime("%H:%M:%S")
+        suffix = f" ({detail})" if detail else ""
+        if changes:
+            suffix = f"{suffix} [{', '.join(changes)}]"
+
+        if port_state is None:
+            port_state = self.port_states[label] = {"healthy": healthy, "failures": 0,
+                                                    "history": deque(maxlen=self.FLAP_WINDOW)}
+            self.log(f"{stamp} {label}: {state}{suffix}")
+        elif port_state["healthy"] != healthy:
+            previous = "UP" if port_state["healthy"] else "DOWN"
+            self.log(f"{stamp} {label}: {previous} -> {state}{suffix}")
+        elif changes:
+            self.log(f"{stamp} {label}: components changed [{', '.join(changes)}]")
+
+        port_state["healthy"] = healthy
+        port_state["failures"] = 0 if healthy else port_state["failures"] + 1
+        port_state["history"].append(healthy)
+        return self.next_delay(port_state)
+
+    def run(self):
+        targets = self.plan_targets()
+        self.port_states = {}
+        self.probe_started = {}
+
+        # Min-heap of (due time, position, target) so the loop only ever looks at the next probe that is due
+        schedule = [(time.monotonic(), position, target) for position, target in enumerate(targets)]
+        heapq.heapify(schedule)
+        active = dict.fromkeys((target.address for target in targets), 0)
+        in_flight = {}
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while not self.should_stop():
+                now = time.monotonic()
+                deferred = []
+                while schedule and schedule[0][0] <= now and len(in_flight) < self.max_workers:
+                    item = heapq.heappop(schedule)
+                    target = item[2]
+                    if active[target.address] >= self.per_host_limit:
+                        deferred.append((now + self.BUSY_RETRY, item[1], target))
+                        continue
+                    active[target.address] += 1
+                    in_flight[executor.submit(self.probe_target, target)] = item
+                for item in deferred:
+                    heapq.heappush(schedule, item)
+
+                # Wake up for the next due probe, a finished probe, or at least twice a second to notice Stop
+                timeout = 0.5
+                if schedule:
+                    timeout = min(timeout, max(0.0, schedule[0][0] - now))
+
+                if not in_flight:
+                    time.sleep(timeout)
+                    continue
+
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _, position, target = in_flight.pop(future)
+                    active[target.address] -= 1
+                    result = future.result()
+                    self.on_result(result)
+                    delay = self.record_result(result)
+                    heapq.heappush(schedule, (time.monotonic() + delay, position, target))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def result_record(result):
+    """Turn a ProbeResult into a JSON-serialisable dict."""
+    timings = None
+    if result.timings:
+        timings = {phase: round(seconds * 1000, 2) for phase, seconds in result.timings.items()}
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "target": result.label,
+        "state": result.state,
+        "detail": result.detail,
+        "changes": list(result.changes),
+        "timings_ms": timings,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check Spring Boot actuator health endpoints without the GUI.")
+    parser.add_argument("--hosts", default="http://10.2.6.74", help="IPs, hostnames, urls or CIDR blocks, comma separated")
+    parser.add_argument("--port-prefix", default="81", help="port prefix, joined with every number of --port-range")
+    parser.add_argument("--port-range", default="3,7", help="start,end range combined with --port-prefix, empty to skip")
+    parser.add_argument("--ports", default="", help="additional full ports, e.g. 8080,9000-9005")
+    parser.add_argument("--context-path", default="/api/actuator/health")
+    parser.add_argument("--concurrency", type=int, default=16, help="max probes in flight in total")
+    parser.add_argument("--per-host", type=int, default=4, help="max probes in flight per host")
+    parser.add_argument("--connect-timeout", type=float, default=2.0)
+    parser.add_argument("--read-timeout", type=float, default=5.0)
+    parser.add_argument("--deadline", type=float, default=30.0, help="whole-scan deadline in seconds")
+    parser.add_argument("--tcp-timeout", type=float, default=0.5,
+                        help="timeout of the TCP reachability stage before the HTTP probes, 0 to skip it")
+    parser.add_argument("--tcp-per-host", type=int, default=128, help="max pending TCP connects per host in that stage")
+    parser.add_argument("--history", default="", help="also record every probe in this SQLite history file")
+    parser.add_argument("--format", choices=("ndjson", "json", "text"), default="ndjson",
+                        help="ndjson streams a record per probe, json prints one array at the end")
+    args = parser.parse_args(argv)
+
+    try:
+        hosts = parse_hosts(args.hosts)
+        ports = set(parse_ports(args.ports))
+        if args.port_range.strip():
+            port_start, port_end = (int(value) for value in args.port_range.strip("()").split(","))
+            ports.update(prefix_ports(args.port_prefix, port_start, port_end))
+    except ValueError as e:
+        parser.error(f"invalid hosts or ports: {e}")
+    if not hosts or not ports:
+        parser.error("nothing to probe, give at least one host and one port")
+
+    records = []
+    failures = []
+    store = None
+    if args.history:
+        # Only imported when asked for, to keep the plain CLI startup lean
+        from healthstore import HealthStore
+        store = HealthStore(args.history)
+
+    def on_result(result):
+        if store is not None:
+            store.add(result)
+        if result.state != "UP":
+            failures.append(result)
+        if args.format == "json":
+            records.append(result_record(result))
+        elif args.format == "text":
+            print(format_result(result), flush=True)
+        else:
+            print(json.dumps(result_record(result)), flush=True)
+
+    def log(message):
+        print(message, file=sys.stderr, flush=True)
+
+    try:
+        sweep = HealthSweep(hosts, sorted(ports), args.context_path, args.concurrency, args.per_host,
+                            args.connect_timeout, args.read_timeout, args.deadline, log=log, on_result=on_result,
+                            tcp_timeout=args.tcp_timeout or None, tcp_per_host_limit=args.tcp_per_host)
+        sweep.run()
+    except ValueError as e:
+        parser.error(str(e))
+    # Hosts that could not be resolved count as unhealthy too
+    failures.extend(sweep.plan_errors)
+    if store is not None:
+        store.close()
+
+    if args.format == "json":
+        json.dump(records, sys.stdout, indent=2)
+        print()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import time
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    target TEXT NOT NULL,
+    ts REAL NOT NULL,
+    state TEXT NOT NULL,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts);
+
+CREATE TABLE IF NOT EXISTS rollup_minute (
+    target TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    probes INTEGER NOT NULL,
+    up INTEGER NOT NULL,
+    latency_sum REAL NOT NULL,
+    latency_count INTEGER NOT NULL,
+    latency_max REAL,
+    PRIMARY KEY (target, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_hour (
+    target TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    probes INTEGER NOT NULL,
+    up INTEGER NOT NULL,
+    latency_sum REAL NOT NULL,
+    latency_count INTEGER NOT NULL,
+    latency_max REAL,
+    PRIMARY KEY (target, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS outages (
+    target TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL,
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outages_target ON outages (target, started);
+"""
+
+ROLLUP_UPSERT = """
+INSERT INTO {table} (target, bucket, probes, up, latency_sum, latency_count, latency_max)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (target, bucket) DO UPDATE SET
+    probes = probes + excluded.probes,
+    up = up + excluded.up,
+    latency_sum = latency_sum + excluded.latency_sum,
+    latency_count = latency_count + excluded.latency_count,
+    latency_max = MAX(COALESCE(latency_max, excluded.latency_max), COALESCE(excluded.latency_max, latency_max))
+"""
+
+
+class HealthStore:
+    """SQLite history of probe results with per-minute and per-hour rollups and an outage log.
+
+    Results are buffered and written in one transaction per batch. Rollups and outage windows are
+    maintained as rows come in, so uptime and outage queries never read the raw samples. compact()
+    drops raw samples after raw_retention and minute rollups after minute_retention; hour rollups
+    and outages are kept.
+    """
+
+    def __init__(self, path, batch_size=500, flush_interval=5.0, raw_retention=24 * 3600, minute_retention=14 * 86400):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.raw_retention = raw_retention
+        self.minute_retention = minute_retention
+        self.lock = threading.Lock()
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.last_compact = 0.0
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        # Outages still open from the last session, so a restart doesn't split or duplicate them
+        self.open_outages = dict(self.db.execute("SELECT target, rowid FROM outages WHERE ended IS NULL"))
+
+    def add(self, result, ts=None):
+        """Buffer one ProbeResult, writing the batch once it is big or old enough."""
+        latency = result.timings["total"] * 1000 if result.timings else None
+        with self.lock:
+            self.pending.append((result.label, time.time() if ts is None else ts, result.state, latency))
+            due = len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered result, update the rollups and outage windows, in one transaction."""
+        with self.lock:
+            batch, self.pending = self.pending, []
+            self.last_flush = time.monotonic()
+            if not batch:
+                return
+
+            # Aggregate the batch in memory first so each bucket costs one upsert, not one per sample
+            rollups = {60: {}, 3600: {}}
+            for target, ts, state, latency in batch:
+                for size, buckets in rollups.items():
+                    row = buckets.setdefault((target, int(ts // size) * size), [0, 0, 0.0, 0, None])
+                    row[0] += 1
+                    row[1] += state == "UP"
+                    if latency is not None:
+                        row[2] += latency
+                        row[3] += 1
+                        row[4] = latency if row[4] is None else max(row[4], latency)
+
+            with self.db:
+                self.db.executemany("INSERT INTO samples (target, ts, state, latency_ms) VALUES (?, ?, ?, ?)", batch)
+                for size, table in ((60, "rollup_minute"), (3600, "rollup_hour")):
+                    self.db.executemany(ROLLUP_UPSERT.format(table=table),
+                                        [(target, bucket, *row) for (target, bucket), row in rollups[size].items()])
+                for target, ts, state, _ in sorted(batch, key=lambda sample: sample[1]):
+                    self.track_outage(target, ts, state)
+
+            if time.time() - self.last_compact >= 3600:
+                self.compact()
+
+    def track_outage(self, target, ts, state):
+        """Open an outage on the first non-UP sample and close it on the next UP one. Caller holds the lock."""
+        outage = self.open_outages.get(target)
+        if state == "UP":
+            if outage is not None:
+                self.db.execute("UPDATE outages SET ended = ? WHERE rowid = ?", (ts, outage))
+                del self.open_outages[target]
+        elif outage is None:
+            cursor = self.db.execute("INSERT INTO outages (target, started, state) VALUES (?, ?, ?)", (target, ts, state))
+            self.open_outages[target] = cursor.lastrowid
+
+    def compact(self):
+        """Drop raw samples and minute rollups that are past their retention. Caller holds the lock."""
+        now = time.time()
+        self.last_compact = now
+        with self.db:
+            self.db.execute("DELETE FROM samples WHERE ts < ?", (now - self.raw_retention,))
+            self.db.execute("DELETE FROM rollup_minute WHERE bucket < ?", (now - self.minute_retention,))
+
+    def targets(self):
+        """Every target that has history."""
+        self.flush()
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT DISTINCT target FROM rollup_hour ORDER BY target")]
+
+    def uptime(self, target, since):
+        """Percentage of UP probes since the given timestamp and the average latency in ms.
+
+        Uses minute rollups while they are still kept for that range, hour rollups beyond it.
+        Returns (None, None) when there were no probes.
+        """
+        self.flush()
+        if time.time() - since <= self.minute_retention:
+            table, bucket = "rollup_minute", int(since // 60) * 60
+        else:
+            table, bucket = "rollup_hour", int(since // 3600) * 3600
+        with self.lock:
+            probes, up, latency_sum, latency_count = self.db.execute(
+                f"SELECT SUM(probes), SUM(up), SUM(latency_sum), SUM(latency_count) FROM {table} WHERE target = ? AND bucket >= ?",
+                (target, bucket)).fetchone()
+        if not probes:
+            return None, None
+        return 100.0 * up / probes, (latency_sum / latency_count if latency_count else None)
+
+    def outage_windows(self, target, since):
+        """(started, ended or None while ongoing, state) for every outage overlapping the range."""
+        self.flush()
+        with self.lock:
+            return self.db.execute(
+                "SELECT started, ended, state FROM outages WHERE target = ? AND (ended IS NULL OR ended >= ?) ORDER BY started",
+                (target, since)).fetchall()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.db.close()
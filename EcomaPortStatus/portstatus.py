@@ -1,68 +1,163 @@
+import os
 import sys
-import subprocess
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QTextEdit, QDesktopWidget, QHBoxLayout
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PyQt5.QtGui import QIcon
+import time
+from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QTextEdit, QDesktopWidget,
+                             QHBoxLayout, QTableView, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QTimer
+from PyQt5.QtGui import QIcon, QColor
+from healthprobe import (MAX_PLAN_SIZE, HealthSweep, HealthWatch, LatencyHistory, parse_hosts, parse_ports,
+                         prefix_ports)
+from healthstore import HealthStore
+
 
 class PortCheckThread(QThread):
     # Signal to send log message back to the UI
     log_signal = pyqtSignal(str)
+    # Every ProbeResult, for the results table and the latency history
+    result_signal = pyqtSignal(object)
     finished_signal = pyqtSignal()
 
-    def __init__(self, ip_address, port_prefix, port_range, context_path):
+    sweep_class = HealthSweep
+
+    def __init__(self, *args, **kwargs):
         super().__init__()
-        self.ip_address = ip_address
-        self.port_prefix = port_prefix
-        self.port_range = port_range
-        self.context_path = context_path
+        # The probing itself lives in healthprobe so the command line can share it without Qt
+        self.sweep = self.sweep_class(*args, log=self.log_signal.emit, on_result=self.result_signal.emit, **kwargs)
 
     def run(self):
-        startupinfo = None
-        if sys.platform == "win32":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-        port_start, port_end = self.port_range
-        for i in range(port_start, port_end + 1):
-            port = str(i)
-            full_port = f"{self.port_prefix}"
-            if len(port) == 2:
-                full_port = f"{full_port}{port}"
-            else:
-                full_port = f"{full_port}0{port}"
-            
-            url = f"{self.ip_address}:{full_port}{self.context_path}"
-
-            try:
-                # Execute curl command without redirection and capture output
-                result = subprocess.run(
-                    ["curl", "-s", url],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    startupinfo=startupinfo
-                )
-
-                # Check if the output contains the status "UP"
-                if "UP" in result.stdout:
-                    self.log_signal.emit(f"{full_port}: UP")
-                else:
-                    self.log_signal.emit(f"{full_port}: DOWN (Response: {result.stdout.strip()})")
-
-            except Exception as e:
-                self.log_signal.emit(f"{full_port}: DOWN (Exception: {e})")
-
+        self.sweep.run()
         self.finished_signal.emit()  # Emit finished signal when done
 
 
+class PortWatchThread(PortCheckThread):
+    """Runs a HealthWatch until requestInterruption() is called."""
+
+    sweep_class = HealthWatch
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sweep.should_stop = self.isInterruptionRequested
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """One row per target with its latest status, latency, last change time and response excerpt.
+
+    Results are applied in batches so a whole batch costs one insert and one dataChanged notification.
+    """
+
+    COLUMNS = ["Target", "Status", "Latency (ms)", "p50 / p95 / p99", "Trend", "Last change", "Response"]
+    STATUS_COLORS = {"UP": QColor("#2e7d32"), "DOWN": QColor("#c62828"), "TIMEOUT": QColor("#ef6c00"),
+                     "CLOSED": QColor("#757575"), "FILTERED": QColor("#6d4c41")}
+    EXCERPT_LENGTH = 120
+
+    def __init__(self, latency_history, parent=None):
+        super().__init__(parent)
+        self.latency_history = latency_history
+        self.rows = []  # [label, state, latency ms or None, last change timestamp, response excerpt]
+        self.row_index = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        label, state, latency, changed_at, excerpt = self.rows[index.row()]
+        column = index.column()
+        history = self.latency_history.get(label)
+
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return label
+            if column == 1:
+                return state
+            if column == 2:
+                return "" if latency is None else f"{latency:.0f}"
+            if column == 3:
+                if history is None or not history.count:
+                    return ""
+                return " / ".join(f"{history.percentile(fraction):.0f}" for fraction in (0.50, 0.95, 0.99))
+            if column == 4:
+                return history.sparkline() if history is not None else ""
+            if column == 5:
+                return time.strftime("%H:%M:%S", time.localtime(changed_at))
+            if column == 6:
+                return excerpt
+        elif role == Qt.UserRole:
+            # Sort key used by the proxy, so numbers and times sort by value rather than as text
+            if column == 2:
+                return -1.0 if latency is None else latency
+            if column == 3:
+                return -1.0 if history is None or not history.count else history.percentile(0.95)
+            if column == 5:
+                return changed_at
+            return self.data(index, Qt.DisplayRole)
+        elif role == Qt.ForegroundRole and column == 1:
+            return self.STATUS_COLORS.get(state)
+        elif role == Qt.ToolTipRole and column == 6:
+            return excerpt
+        return None
+
+    def apply_results(self, results):
+        """Update existing rows and append new ones for a batch of ProbeResults."""
+        now = time.time()
+        new_rows = []
+        first_changed = last_changed = None
+        for result in results:
+            latency = result.timings["total"] * 1000 if result.timings else None
+            excerpt = result.detail
+            if result.changes:
+                excerpt = f"{excerpt} [{', '.join(result.changes)}]".strip()
+            excerpt = excerpt[:self.EXCERPT_LENGTH]
+
+            row = self.row_index.get(result.label)
+            if row is None:
+                new_rows.append([result.label, result.state, latency, now, excerpt])
+                continue
+            values = self.rows[row]
+            if values[1] != result.state:
+                values[3] = now
+            values[1], values[2], values[4] = result.state, latency, excerpt
+            first_changed = row if first_changed is None else min(first_changed, row)
+            last_changed = row if last_changed is None else max(last_changed, row)
+
+        if first_changed is not None:
+            self.dataChanged.emit(self.index(first_changed, 0), self.index(last_changed, len(self.COLUMNS) - 1))
+        if new_rows:
+            start = len(self.rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+            for offset, values in enumerate(new_rows):
+                self.row_index[values[0]] = start + offset
+                self.rows.append(values)
+            self.endInsertRows()
+
+    def clear(self):
+        """Remove every row."""
+        self.beginResetModel()
+        self.rows = []
+        self.row_index = {}
+        self.endResetModel()
+
+
 class PortStatusChecker(QWidget):
+    # Milliseconds between flushes of queued probe results into the table
+    RESULT_FLUSH_INTERVAL = 200
+
     def __init__(self):
         super().__init__()
 
         self.setWindowIcon(QIcon('D:\\.env\\app.ico'))
 
         # Create labels and input boxes with default values
-        self.ip_label = QLabel("IP Address")
+        self.ip_label = QLabel("Hosts (IPs, hostnames or CIDR blocks, comma separated)")
         self.ip_input = QLineEdit("http://10.2.6.74")  # Default IP Address
 
         self.port_prefix_label = QLabel("Port prefix")
@@ -71,20 +166,73 @@ class PortStatusChecker(QWidget):
         self.port_range_label = QLabel("Port range (e.g., 3,7)")
         self.port_range_input = QLineEdit("3,7")  # Default Port Range
 
+        self.extra_ports_label = QLabel("Additional ports (e.g., 8080,9000-9005)")
+        self.extra_ports_input = QLineEdit("")  # Full port numbers probed on top of the prefix range
+
         self.context_path_label = QLabel("Context path")
         self.context_path_input = QLineEdit("/api/actuator/health")  # Default Context Path
         self.context_path_input.setReadOnly(True)
 
+        self.concurrency_label = QLabel("Max concurrent probes (total,per host)")
+        self.concurrency_input = QLineEdit("16,4")  # Default concurrency limits
+
+        self.timeouts_label = QLabel("Timeouts in seconds (connect,read,deadline)")
+        self.timeouts_input = QLineEdit("2,5,30")  # Default per-probe timeouts and whole-scan deadline
+
         # Create buttons
         self.run_button = QPushButton("Run")
         self.run_button.clicked.connect(self.check_ports)
 
+        self.watch_button = QPushButton("Watch")
+        self.watch_button.clicked.connect(self.toggle_watch)
+
+        self.latency_button = QPushButton("Latency")
+        self.latency_button.clicked.connect(self.show_latency_summary)
+
+        self.history_button = QPushButton("History")
+        self.history_button.clicked.connect(self.show_history)
+
         self.clear_button = QPushButton("Clear")
         self.clear_button.clicked.connect(self.clear_console)
 
+        # Latency history per target label, fed by every probe from both the sweep and the watch loop
+        self.latency_history = {}
+
+        # Last parsed actuator report per target label, shared by sweeps and the watch loop
+        self.health_reports = {}
+
+        # Results grid: the model holds the rows, the proxy sorts and filters without touching them
+        self.results_model = ResultsTableModel(self.latency_history, self)
+        self.results_proxy = QSortFilterProxyModel(self)
+        self.results_proxy.setSourceModel(self.results_model)
+        self.results_proxy.setSortRole(Qt.UserRole)
+        self.results_proxy.setFilterKeyColumn(-1)  # Filter on every column
+        self.results_proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+        self.results_view = QTableView()
+        self.results_view.setModel(self.results_proxy)
+        self.results_view.setSortingEnabled(True)
+        self.results_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_view.verticalHeader().setVisible(False)
+        self.results_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.results_view.horizontalHeader().setStretchLastSection(True)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter results (e.g., DOWN or 10.2.6.74)")
+        self.filter_input.textChanged.connect(self.results_proxy.setFilterFixedString)
+
+        # Probe results are coalesced per target here and applied to the table on a timer
+        self.pending_results = {}
+        self.result_flush_timer = QTimer(self)
+        self.result_flush_timer.setInterval(self.RESULT_FLUSH_INTERVAL)
+        self.result_flush_timer.timeout.connect(self.flush_results)
+        self.result_flush_timer.start()
+
         # TextEdit to display console output
         self.console_output = QTextEdit()
         self.console_output.setReadOnly(True)  # Make console output read-only
+        self.console_output.setFixedHeight(150)
 
         # Layout
         layout = QVBoxLayout()
@@ -94,22 +242,58 @@ class PortStatusChecker(QWidget):
         layout.addWidget(self.port_prefix_input)
         layout.addWidget(self.port_range_label)
         layout.addWidget(self.port_range_input)
+        layout.addWidget(self.extra_ports_label)
+        layout.addWidget(self.extra_ports_input)
         layout.addWidget(self.context_path_label)
         layout.addWidget(self.context_path_input)
+        layout.addWidget(self.concurrency_label)
+        layout.addWidget(self.concurrency_input)
+        layout.addWidget(self.timeouts_label)
+        layout.addWidget(self.timeouts_input)
 
         # Add buttons to a horizontal layout
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.run_button)
+        button_layout.addWidget(self.watch_button)
+        button_layout.addWidget(self.latency_button)
+        button_layout.addWidget(self.history_button)
         button_layout.addWidget(self.clear_button)
 
         layout.addLayout(button_layout)
+        layout.addWidget(self.filter_input)
+        layout.addWidget(self.results_view)
         layout.addWidget(self.console_output)
 
         self.setLayout(layout)
+        self.open_health_store()
         self.setWindowTitle("ECOMA: Port Status Checker")
-        self.setFixedWidth(500)  # Set default width to 500px
+        self.resize(900, 800)
         self.center_on_screen()
 
+    def open_health_store(self):
+        """Open the probe history database next to the script (or the executable when frozen)."""
+        if getattr(sys, 'frozen', False):
+            base_dir = os.path.dirname(sys.executable)
+        else:
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+
+        try:
+            self.health_store = HealthStore(os.path.join(base_dir, "health_history.db"))
+        except Exception as e:
+            self.health_store = None
+            self.log_to_console(f"History disabled, could not open health_history.db: {e}")
+
+    def closeEvent(self, event):
+        """Stop watching and write any buffered history before the window goes away."""
+        if getattr(self, "port_watch_thread", None) is not None and self.port_watch_thread.isRunning():
+            self.port_watch_thread.requestInterruption()
+            self.port_watch_thread.wait()
+        if self.health_store is not None:
+            # A one-off sweep can't be interrupted; results it still delivers skip the closed store
+            health_store, self.health_store = self.health_store, None
+            health_store.close()
+        super().closeEvent(event)
+
     def center_on_screen(self):
         """Centers the window on the screen."""
         screen_geometry = QDesktopWidget().availableGeometry().center()
@@ -123,35 +307,159 @@ class PortStatusChecker(QWidget):
         self.console_output.verticalScrollBar().setValue(self.console_output.verticalScrollBar().maximum())
 
     def clear_console(self):
-        """Clear the console output."""
+        """Clear the console output and the results table."""
         self.console_output.clear()
+        self.pending_results = {}
+        self.results_model.clear()
 
-    def check_ports(self):
-        ip_address = self.ip_input.text()
+    def queue_result(self, result):
+        """Record the probe latency and keep only the newest result per target until the next flush."""
+        if result.timings:
+            history = self.latency_history.get(result.label)
+            if history is None:
+                history = self.latency_history[result.label] = LatencyHistory()
+            history.add(result.timings["total"] * 1000)
+        self.pending_results[result.label] = result
+        if self.health_store is not None:
+            self.health_store.add(result)
+
+    def flush_results(self):
+        """Apply every queued result to the table in one batch."""
+        if not self.pending_results:
+            return
+        batch = list(self.pending_results.values())
+        self.pending_results = {}
+        self.results_model.apply_results(batch)
+
+    def show_latency_summary(self):
+        """Log p50/p95/p99 and a sparkline for every target probed so far."""
+        if not self.latency_history:
+            self.log_to_console("No latency samples yet. Run or Watch first")
+            return
+        for label in sorted(self.latency_history):
+            self.log_to_console(f"{label}: {self.latency_history[label].summary()}")
+
+    def show_history(self):
+        """Log 24 hour and 7 day uptime plus the outages of the last 24 hours for every recorded target."""
+        if self.health_store is None:
+            self.log_to_console("History is disabled")
+            return
+        now = time.time()
+        targets = self.health_store.targets()
+        if not targets:
+            self.log_to_console("No history yet. Run or Watch first")
+            return
+        for target in targets:
+            day, day_latency = self.health_store.uptime(target, now - 86400)
+            week, _ = self.health_store.uptime(target, now - 7 * 86400)
+            line = f"{target}: uptime 24h {day or 0:.2f}%, 7d {week or 0:.2f}%"
+            if day_latency is not None:
+                line = f"{line}, avg {day_latency:.0f} ms"
+            self.log_to_console(line)
+            for started, ended, state in self.health_store.outage_windows(target, now - 86400):
+                until = time.strftime("%m-%d %H:%M:%S", time.localtime(ended)) if ended else "now"
+                length = (ended or now) - started
+                self.log_to_console(f"    {state} from {time.strftime('%m-%d %H:%M:%S', time.localtime(started))} "
+                                    f"to {until} ({length / 60:.1f} min)")
+
+    def read_settings(self):
+        """Validate the inputs and return the PortCheckThread arguments, or None if something is invalid."""
         port_prefix = self.port_prefix_input.text()
         port_range = self.port_range_input.text().strip("()").split(",")
         context_path = self.context_path_input.text()
 
+        try:
+            hosts = parse_hosts(self.ip_input.text())
+        except ValueError as e:
+            self.log_to_console(f"Invalid hosts: {e}")
+            return None
+        if not hosts:
+            self.log_to_console("Please enter at least one host")
+            return None
+
         try:
             port_start, port_end = int(port_range[0]), int(port_range[1])
         except (ValueError, IndexError):
             self.log_to_console("Invalid port range. Please enter in format (start,end)")
+            return None
+
+        try:
+            ports = sorted(set(prefix_ports(port_prefix, port_start, port_end)) | set(parse_ports(self.extra_ports_input.text())))
+        except ValueError as e:
+            self.log_to_console(f"Invalid ports: {e}")
+            return None
+
+        try:
+            max_workers, per_host_limit = (int(value) for value in self.concurrency_input.text().split(","))
+        except ValueError:
+            self.log_to_console("Invalid concurrency. Please enter in format (total,per host)")
+            return None
+
+        try:
+            connect_timeout, read_timeout, scan_deadline = (float(value) for value in self.timeouts_input.text().split(","))
+        except ValueError:
+            self.log_to_console("Invalid timeouts. Please enter in format (connect,read,deadline)")
+            return None
+
+        if len(hosts) * len(ports) > MAX_PLAN_SIZE:
+            self.log_to_console(f"Too many probes ({len(hosts) * len(ports)}), the limit is {MAX_PLAN_SIZE}")
+            return None
+
+        return (hosts, ports, context_path, max_workers, per_host_limit,
+                connect_timeout, read_timeout, scan_deadline)
+
+    def check_ports(self):
+        settings = self.read_settings()
+        if settings is None:
             return
 
         # Disable the Run button and change text to "Running..."
         self.run_button.setText("Running...")
         self.run_button.setEnabled(False)
+        self.watch_button.setEnabled(False)
 
         # Create and start a thread to handle port checking
-        self.port_check_thread = PortCheckThread(ip_address, port_prefix, (port_start, port_end), context_path)
+        self.port_check_thread = PortCheckThread(*settings, health_reports=self.health_reports)
         self.port_check_thread.log_signal.connect(self.log_to_console)
+        self.port_check_thread.result_signal.connect(self.queue_result)
         self.port_check_thread.finished_signal.connect(self.on_port_check_finished)
         self.port_check_thread.start()
 
     def on_port_check_finished(self):
         """Callback when the port check process is finished."""
+        self.flush_results()
         self.run_button.setText("Run")
         self.run_button.setEnabled(True)
+        self.watch_button.setEnabled(True)
+
+    def toggle_watch(self):
+        """Start continuous monitoring, or stop it if it is already running."""
+        if getattr(self, "port_watch_thread", None) is not None and self.port_watch_thread.isRunning():
+            self.watch_button.setText("Stopping...")
+            self.watch_button.setEnabled(False)
+            self.port_watch_thread.requestInterruption()
+            return
+
+        settings = self.read_settings()
+        if settings is None:
+            return
+
+        self.watch_button.setText("Stop")
+        self.run_button.setEnabled(False)
+        self.log_to_console("Watching ports, only state changes are reported...")
+
+        self.port_watch_thread = PortWatchThread(*settings, health_reports=self.health_reports)
+        self.port_watch_thread.log_signal.connect(self.log_to_console)
+        self.port_watch_thread.result_signal.connect(self.queue_result)
+        self.port_watch_thread.finished_signal.connect(self.on_port_watch_finished)
+        self.port_watch_thread.start()
+
+    def on_port_watch_finished(self):
+        """Callback when the watch loop has stopped."""
+        self.log_to_console("Watch stopped.")
+        self.watch_button.setText("Watch")
+        self.watch_button.setEnabled(True)
+        self.run_button.setEnabled(True)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,57 +1,31 @@
 import sys
-import base64
-#pip install python-magic-bin
-import magic
 from pathlib import Path
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, 
-    QTextEdit, QMessageBox, QFileDialog, QHBoxLayout, QMenu, QAction
+    QTextEdit, QMessageBox, QFileDialog, QHBoxLayout, QMenu, QAction, QCheckBox
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from base64core import decode_file
 
 
 class FileProcessingThread(QThread):
     log_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(str)
 
-    def __init__(self, source_in, source_out):
+    def __init__(self, source_in, source_out, use_mmap=True):
         super().__init__()
         self.source_in = source_in
         self.source_out = source_out
+        self.use_mmap = use_mmap
 
     def run(self):
         try:
             self.log_signal.emit(f"Starting processing: {self.source_in}")
-            # Read the base64 string from the file
-            with open(self.source_in, "r") as file:
-                base64_string = file.read()
-
-            # Decode the base64 string
-            file_data = base64.b64decode(base64_string)
-
-            # Detect the file type using the magic library
-            file_type = magic.from_buffer(file_data, mime=True)
-            self.log_signal.emit(f"Detected file type: {file_type}")
-
-            # Map common MIME types to file extensions
-            mime_to_extension = {
-                "application/zip": "zip",
-                "image/jpeg": "jpg",
-                "image/png": "png",
-                "application/pdf": "pdf",
-                "application/x-7z-compressed": "7z",
-            }
-
-            # Get the file extension based on the detected MIME type
-            file_extension = mime_to_extension.get(file_type, "bin")  # Default to 'bin' if unknown
-
-            # Create output file path based on the input file name
-            output_file_path = f"{self.source_out}.{file_extension}"
-            with open(output_file_path, "wb") as output_file:
-                output_file.write(file_data)
-
-            self.log_signal.emit(f"File successfully created: {output_file_path}")
-            self.finished_signal.emit(output_file_path)
+            # Decoding, file type detection and writing are shared with V2 and the command line
+            decoded = decode_file(self.source_in, self.source_out, self.use_mmap)
+            self.log_signal.emit(f"Detected file type: {decoded.file_type}")
+            self.log_signal.emit(f"File successfully created: {decoded.path}")
+            self.finished_signal.emit(decoded.path)
         except Exception as e:
             self.log_signal.emit(f"Error: {str(e)}")
             self.finished_signal.emit("")
@@ -91,6 +65,11 @@ class MainWindow(QWidget):
         layout.addLayout(self.create_input_with_browse("Source Input File Path:", True))
         layout.addLayout(self.create_input_with_browse("Source Output File Path:", False))
 
+        # Memory-mapped reading of the input file
+        self.mmap_checkbox = QCheckBox("Memory-map input file")
+        self.mmap_checkbox.setChecked(True)
+        layout.addWidget(self.mmap_checkbox)
+
         # Log output
         self.log_output = LogOutput()
         self.log_output.setFixedHeight(250)  # Set console message height
@@ -153,7 +132,7 @@ class MainWindow(QWidget):
         self.process_button.setEnabled(False)
 
         # Start the background thread
-        self.thread = FileProcessingThread(source_in, source_out)
+        self.thread = FileProcessingThread(source_in, source_out, self.mmap_checkbox.isChecked())
         self.thread.log_signal.connect(self.update_log)
         self.thread.finished_signal.connect(self.processing_finished)
         self.thread.start()
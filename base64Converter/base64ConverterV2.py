@@ -1,66 +1,504 @@
+import os
 import sys
-import base64
-# pip install python-magic-bin
-import magic
+import glob
+import mmap
+import time
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, QPlainTextEdit, QPushButton,
-    QTextEdit, QMessageBox, QFileDialog, QHBoxLayout, QMenu, QAction, QRadioButton, QButtonGroup
+    QTextEdit, QMessageBox, QFileDialog, QHBoxLayout, QMenu, QAction, QRadioButton, QButtonGroup,
+    QCheckBox, QSpinBox, QProgressBar
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSize
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, QFileSystemWatcher, pyqtSignal, QSize
+from base64core import (
+    CHUNK_SIZE, PARALLEL_MIN_SIZE, SNIFF_SIZE, MIME_LINE_LENGTH, MIN_BLOB_LENGTH,
+    JobCancelled, Checksums, watch_cancel, check_cancel, track_progress, decode_stream, decode_mapped, decode_parallel,
+    encode_stream, scan_blobs, sniff_mime, format_digests, describe_output, stored_output, output_path, write_decoded, decode_file
+)
+from decodejournal import DecodeJournal
+
+# Pastes larger than this bypass the text box, which only shows their first PREVIEW_LENGTH characters
+LARGE_PASTE_SIZE = 1024 * 1024
+PREVIEW_LENGTH = 200
+
+# Seconds between two progress updates, the last one always goes out
+PROGRESS_INTERVAL = 0.2
 
+# Milliseconds a watched file must go without a change before it counts as fully written
+SETTLE_TIME = 2000
+# Watch Mode's record of decoded inputs, kept in the output folder
+JOURNAL_NAME = ".base64-watch-journal.sqlite3"
 
-class FileProcessingThread(QThread):
+
+class JobThread(QThread):
+    """Base of the worker threads: log, progress and finished signals, and cancelling through requestInterruption()."""
     log_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(int, str)
     finished_signal = pyqtSignal(str)
 
-    def __init__(self, source_data, source_out, is_file_mode):
+    def start_progress(self, total):
+        self.progress_total = total
+        self.progress_started = time.monotonic()
+        self.progress_reported = 0.0
+
+    def report(self, done):
+        """Progress callback of the pipelines, raising JobCancelled once the job was cancelled.
+
+        Updates go out at most every PROGRESS_INTERVAL seconds, plus the final one.
+        """
+        if self.isInterruptionRequested():
+            raise JobCancelled()
+        now = time.monotonic()
+        if now - self.progress_reported < PROGRESS_INTERVAL and done < self.progress_total:
+            return
+        self.progress_reported = now
+        rate = done / max(now - self.progress_started, 1e-6)
+        percent = 100 * done // self.progress_total if self.progress_total else 100
+        eta = (self.progress_total - done) / rate if rate else 0
+        self.progress_signal.emit(percent, f"{done / (1024 * 1024):.1f} of {self.progress_total / (1024 * 1024):.1f} MB, "
+                                           f"{rate / (1024 * 1024):.1f} MB/s, ETA {eta:.0f}s")
+
+
+class FileProcessingThread(JobThread):
+
+    def __init__(self, source_data, source_out, is_file_mode, use_mmap=True, parallel=False, digests=("sha256",),
+                 dedupe=False, decompress=False):
         super().__init__()
         self.source_data = source_data
         self.source_out = source_out
         self.is_file_mode = is_file_mode
+        self.use_mmap = use_mmap
+        self.parallel = parallel
+        self.digests = digests
+        self.dedupe = dedupe
+        self.decompress = decompress
+
+    def read_chunks(self):
+        """Yield the pasted base64 text, a str or the clipboard's QByteArray, as CHUNK_SIZE pieces of ASCII bytes."""
+        for start in range(0, len(self.source_data), CHUNK_SIZE):
+            if isinstance(self.source_data, str):
+                yield self.source_data[start:start + CHUNK_SIZE].encode("ascii", errors="ignore")
+            else:
+                yield self.source_data.mid(start, CHUNK_SIZE).data()
 
     def run(self):
         try:
             self.log_signal.emit(f"Starting processing...")
 
-            if self.is_file_mode:
-                # Read the base64 string from the file
-                with open(self.source_data, "r") as file:
-                    base64_string = file.read()
+            self.start_progress(os.path.getsize(self.source_data) if self.is_file_mode else len(self.source_data))
+
+            # Unpacking streams the decoded bytes through the decompressor, which the pool can't split up
+            if self.is_file_mode and self.parallel and not self.decompress and self.progress_total >= PARALLEL_MIN_SIZE:
+                decoded = self.run_parallel()
+            else:
+                if self.is_file_mode:
+                    decoded = decode_file(self.source_data, self.source_out, self.use_mmap, self.report, self.digests,
+                                          self.dedupe, self.decompress)
+                else:
+                    chunks = track_progress(self.read_chunks(), self.report)
+                    decoded = write_decoded(decode_stream(chunks), self.source_out, digests=self.digests,
+                                            dedupe=self.dedupe, decompress=self.decompress)
+                self.log_signal.emit(f"Detected file type: {decoded.file_type}")
+
+            if decoded.file_type == "application/zip" and decoded.unpacked:
+                self.log_signal.emit(f"Unpacked {decoded.unpacked} file(s) to {decoded.path}")
+                self.finished_signal.emit(decoded.path)
+                return
+            if decoded.unpacked:
+                self.log_signal.emit("Decompressed the gzip stream")
+            self.log_signal.emit(format_digests(decoded.digests))
+            if decoded.duplicate:
+                self.log_signal.emit(f"Same content already stored, nothing written: {decoded.path}")
             else:
-                # Use the pasted Base64 string directly
-                base64_string = self.source_data
+                self.log_signal.emit(f"File successfully created: {decoded.path}")
+            self.finished_signal.emit(decoded.path)
+        except JobCancelled:
+            self.log_signal.emit("Cancelled, the partial output was removed")
+            self.finished_signal.emit("")
+        except Exception as e:
+            self.log_signal.emit(f"Error: {str(e)}")
+            self.finished_signal.emit("")
+
+    def run_parallel(self):
+        """Sniff the file type from the start of the input, then decode all of it across the process pool."""
+        with open(self.source_data, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            head = next(decode_mapped(mapped, SNIFF_SIZE), b"")
+        file_type = sniff_mime(head)
+        self.log_signal.emit(f"Detected file type: {file_type}")
+
+        output_file_path = output_path(self.source_out, file_type, self.source_data) + (".part" if self.dedupe else "")
+        workers = os.cpu_count() or 1
+        self.log_signal.emit(f"Decoding in parallel on {workers} processes...")
+        digests = set(self.digests) | {"sha256"} if self.dedupe else self.digests
+        try:
+            # The segments are hashed in order as they come back, no second pass over the output
+            checksums = Checksums(digests)
+            if decode_parallel(self.source_data, output_file_path, workers, self.report, checksums) is None:
+                self.log_signal.emit("Padding inside the base64 text, decoding serially instead")
+                self.start_progress(self.progress_total)
+                checksums = Checksums(digests)
+                with open(self.source_data, "rb") as file, \
+                        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                        open(output_file_path, "wb") as output_file:
+                    for block in decode_mapped(mapped, progress=self.report):
+                        checksums.update(block)
+                        output_file.write(block)
+        except Exception:
+            if Path(output_file_path).exists():
+                Path(output_file_path).unlink()
+            raise
+        return stored_output(output_file_path, self.source_out, file_type, checksums.hexdigests(), self.dedupe)
+
+
+class EncodeProcessingThread(JobThread):
+    """Stream a binary file to base64 text, optionally MIME-wrapped, URL-safe or as a data: URI."""
+
+    def __init__(self, source_path, source_out, line_length=0, urlsafe=False, data_uri=False):
+        super().__init__()
+        self.source_path = source_path
+        self.source_out = source_out
+        self.line_length = line_length
+        self.urlsafe = urlsafe
+        self.data_uri = data_uri
 
-            # Decode the base64 string
-            file_data = base64.b64decode(base64_string)
+    def run(self):
+        output_file_path = f"{self.source_out}.txt"
+        try:
+            self.log_signal.emit(f"Starting encoding...")
+            self.start_progress(os.path.getsize(self.source_path))
+            with open(self.source_path, "rb") as file, open(output_file_path, "wb") as output_file:
+                chunks = track_progress(iter(lambda: file.read(CHUNK_SIZE), b""), self.report)
+                if self.data_uri:
+                    first_chunk = next(chunks, b"")
+                    file_type = sniff_mime(first_chunk)
+                    self.log_signal.emit(f"Detected file type: {file_type}")
+                    output_file.write(f"data:{file_type};base64,".encode("ascii"))
+                    chunks = itertools.chain([first_chunk], chunks)
+                for text in encode_stream(chunks, self.line_length, self.urlsafe):
+                    output_file.write(text)
 
-            # Detect the file type using the magic library
-            file_type = magic.from_buffer(file_data, mime=True)
-            self.log_signal.emit(f"Detected file type: {file_type}")
+            self.log_signal.emit(f"File successfully created: {output_file_path}")
+            self.finished_signal.emit(output_file_path)
+        except Exception as e:
+            # Don't leave a half-written file behind when encoding fails part way through
+            if Path(output_file_path).exists():
+                Path(output_file_path).unlink()
+            if isinstance(e, JobCancelled):
+                self.log_signal.emit("Cancelled, the partial output was removed")
+            else:
+                self.log_signal.emit(f"Error: {str(e)}")
+            self.finished_signal.emit("")
 
-            # Map common MIME types to file extensions
-            mime_to_extension = {
-                "application/zip": "zip",
-                "image/jpeg": "jpg",
-                "image/png": "png",
-                "application/pdf": "pdf",
-                "application/x-7z-compressed": "7z",
-            }
 
-            # Get the file extension based on the detected MIME type
-            file_extension = mime_to_extension.get(file_type, "bin")  # Default to 'bin' if unknown
+class ScanProcessingThread(JobThread):
+    """Decode every base64 run and data: URI embedded in a JSON, HTML, log or any other file."""
 
-            # Create output file path
-            output_file_path = f"{self.source_out}.{file_extension}"
-            with open(output_file_path, "wb") as output_file:
-                output_file.write(file_data)
+    def __init__(self, source_path, output_folder, min_length=MIN_BLOB_LENGTH, digests=("sha256",), dedupe=False,
+                 decompress=False):
+        super().__init__()
+        self.source_path = source_path
+        self.output_folder = output_folder
+        self.min_length = min_length
+        self.digests = digests
+        self.dedupe = dedupe
+        self.decompress = decompress
 
-            self.log_signal.emit(f"File successfully created: {output_file_path}")
-            self.finished_signal.emit(output_file_path)
+    def run(self):
+        try:
+            self.log_signal.emit(f"Scanning {self.source_path} for base64 of {self.min_length}+ characters...")
+            stem = Path(self.source_path).stem
+            found = failed = duplicates = 0
+            self.start_progress(os.path.getsize(self.source_path))
+            with open(self.source_path, "rb") as file:
+                chunks = track_progress(iter(lambda: file.read(CHUNK_SIZE), b""), self.report)
+                pieces = scan_blobs(chunks, self.min_length)
+                for _, group in itertools.groupby(pieces, key=lambda piece: piece[0]):
+                    _, offset, declared_type, first_text = next(group)
+                    found += 1
+                    texts = itertools.chain([first_text], (text for _, _, _, text in group))
+                    source_out = str(Path(self.output_folder) / f"{stem}_{found:03d}")
+                    try:
+                        decoded = write_decoded(decode_stream(texts), source_out, file_type=declared_type,
+                                                digests=self.digests, dedupe=self.dedupe, decompress=self.decompress)
+                    except JobCancelled:
+                        raise
+                    except Exception as e:
+                        # groupby skips the rest of a broken run on its own
+                        failed += 1
+                        self.log_signal.emit(f"Offset {offset}: Error: {str(e)}")
+                        continue
+                    source = "data: URI" if declared_type else "base64"
+                    duplicates += decoded.duplicate
+                    self.log_signal.emit(f"Offset {offset}: {source} -> {describe_output(decoded)}")
+
+            self.log_signal.emit(f"Scan finished: {found - failed} extracted ({duplicates} duplicates), {failed} failed")
+            self.finished_signal.emit("")
+        except JobCancelled:
+            self.log_signal.emit("Cancelled, the partial output was removed")
+            self.finished_signal.emit("")
+        except Exception as e:
+            self.log_signal.emit(f"Error: {str(e)}")
+            self.finished_signal.emit("")
+
+
+class BatchProcessingThread(JobThread):
+    """Decode every file of a folder (its .txt files) or of a glob pattern on a pool of processes."""
+
+    def __init__(self, source_pattern, output_folder, use_mmap=True, max_workers=None, digests=("sha256",),
+                 dedupe=False, decompress=False):
+        super().__init__()
+        self.source_pattern = source_pattern
+        self.output_folder = output_folder
+        self.use_mmap = use_mmap
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.digests = digests
+        self.dedupe = dedupe
+        self.decompress = decompress
+
+    def list_files(self):
+        if Path(self.source_pattern).is_dir():
+            return sorted(Path(self.source_pattern).glob("*.txt"))
+        return sorted(Path(path) for path in glob.glob(self.source_pattern) if Path(path).is_file())
+
+    def run(self):
+        files = self.list_files()
+        if not files:
+            self.log_signal.emit(f"Error: No files match {self.source_pattern}")
+            self.finished_signal.emit("")
+            return
+
+        self.log_signal.emit(f"Decoding {len(files)} files on {self.max_workers} processes...")
+        started = time.perf_counter()
+        decoded = failed = duplicates = decoded_bytes = done_bytes = 0
+        cancelled = False
+        pending = {}
+        queue = iter(enumerate(files, 1))
+        self.start_progress(sum(path.stat().st_size for path in files))
+        # Set on Cancel, the files in flight then stop within a chunk through check_cancel
+        cancel = multiprocessing.Event()
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=watch_cancel, initargs=(cancel,)) as executor:
+            while True:
+                # Keep only as many files in flight as there are workers, the rest wait their turn
+                while not cancelled and len(pending) < self.max_workers:
+                    index, path = next(queue, (None, None))
+                    if path is None:
+                        break
+                    self.log_signal.emit(f"[{index}/{len(files)}] Decoding {path.name}...")
+                    source_out = str(Path(self.output_folder) / path.stem)
+                    future = executor.submit(decode_file, str(path), source_out, self.use_mmap, check_cancel,
+                                             self.digests, self.dedupe, self.decompress)
+                    pending[future] = (index, path)
+                if not pending:
+                    break
+
+                # Wake up every PROGRESS_INTERVAL so a Cancel is seen while a big file is still decoding
+                done, _ = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, path = pending.pop(future)
+                    size = path.stat().st_size
+                    done_bytes += size
+                    try:
+                        result = future.result()
+                    except JobCancelled:
+                        self.log_signal.emit(f"[{index}/{len(files)}] {path.name}: Cancelled, partial output removed")
+                        continue
+                    except Exception as e:
+                        failed += 1
+                        self.log_signal.emit(f"[{index}/{len(files)}] {path.name}: Error: {str(e)}")
+                        continue
+                    decoded += 1
+                    duplicates += result.duplicate
+                    decoded_bytes += size
+                    self.log_signal.emit(f"[{index}/{len(files)}] {path.name} ({size / (1024 * 1024):.1f} MB) -> "
+                                         f"{describe_output(result)}")
+
+                try:
+                    self.report(done_bytes)
+                except JobCancelled:
+                    if not cancelled:
+                        # The rest of the queue is dropped, the files in flight stop at their next chunk
+                        cancelled = True
+                        cancel.set()
+                        self.log_signal.emit(f"Cancelling, stopping {len(pending)} files in flight...")
+
+        if cancelled:
+            self.log_signal.emit(f"Cancelled, {len(files) - decoded - failed} files not decoded")
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        self.log_signal.emit(f"Batch finished: {decoded} decoded ({duplicates} duplicates), {failed} failed in {elapsed:.1f}s "
+                             f"({(decoded + failed) / elapsed:.1f} files/s, {decoded_bytes / (1024 * 1024) / elapsed:.1f} MB/s)")
+        self.finished_signal.emit("")
+
+
+class FolderWatcher(QObject):
+    """Watch Mode: decode every .txt file written into a folder, until cancelled.
+
+    The folder is watched through QFileSystemWatcher, nothing is polled. A new file is decoded once
+    it has gone SETTLE_TIME ms without a change notification and its size and mtime hold still. The
+    decodes run on a pool of max_workers processes, files beyond that wait their turn. A DecodeJournal
+    in the output folder makes each input decoded once, also across restarts; files that arrived
+    while the app was closed are picked up when watching starts. Has the signals of a JobThread.
+    """
+    log_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(int, str)
+    finished_signal = pyqtSignal(str)
+    # (key, future) of a finished decode, emitted from the pool's thread
+    decoded_signal = pyqtSignal(object, object)
+
+    def __init__(self, folder, output_folder, use_mmap=True, max_workers=None, digests=("sha256",), dedupe=False,
+                 decompress=False):
+        super().__init__()
+        self.folder = os.path.abspath(folder)
+        self.output_folder = output_folder
+        self.use_mmap = use_mmap
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.digests = digests
+        self.dedupe = dedupe
+        self.decompress = decompress
+        self.settling = {}  # path -> (size, mtime_ns, QTimer) of files still being written
+        self.queue = deque()
+        self.in_flight = set()
+        self.stopping = False
+        self.decoded = self.failed = 0
+        self.decoded_signal.connect(self.on_decoded)
+
+    def start(self):
+        try:
+            self.journal = DecodeJournal(str(Path(self.output_folder) / JOURNAL_NAME))
         except Exception as e:
             self.log_signal.emit(f"Error: {str(e)}")
             self.finished_signal.emit("")
+            return
+        if self.journal.interrupted:
+            self.log_signal.emit(f"{self.journal.interrupted} file(s) were cut off last time, decoding them again")
+        self.cancel = multiprocessing.Event()
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=watch_cancel,
+                                            initargs=(self.cancel,))
+        self.watcher = QFileSystemWatcher([self.folder], self)
+        self.watcher.directoryChanged.connect(self.scan_folder)
+        self.watcher.fileChanged.connect(self.file_changed)
+        self.log_signal.emit(f"Watching {self.folder} for .txt files, decoding on {self.max_workers} processes...")
+        self.scan_folder()
+        self.report()
+
+    def scan_folder(self):
+        """Start settling every .txt file of the folder that is new to this session and the journal."""
+        if self.stopping:
+            return
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(".txt") or entry.path in self.settling or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                key = (entry.path, stat.st_size, stat.st_mtime_ns)
+                if key in self.in_flight or key in self.queue or self.journal.seen(key):
+                    continue
+                timer = QTimer(self)
+                timer.setSingleShot(True)
+                timer.timeout.connect(lambda path=entry.path: self.settled(path))
+                self.settling[entry.path] = (stat.st_size, stat.st_mtime_ns, timer)
+                self.watcher.addPath(entry.path)
+                timer.start(SETTLE_TIME)
+
+    def file_changed(self, path):
+        """The writer is still at it, start the wait over."""
+        if path in self.settling:
+            self.settling[path][2].start(SETTLE_TIME)
+
+    def settled(self, path):
+        """Queue the file once nothing changed it for SETTLE_TIME, checking its size too for shares without notifications."""
+        size, mtime_ns, timer = self.settling[path]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None  # Moved away or deleted before it was done
+        if stat and (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+            self.settling[path] = (stat.st_size, stat.st_mtime_ns, timer)
+            timer.start(SETTLE_TIME)
+            return
+        del self.settling[path]
+        timer.deleteLater()
+        self.watcher.removePath(path)
+        if stat and self.journal.claim((path, size, mtime_ns)):
+            self.queue.append((path, size, mtime_ns))
+            self.submit_queued()
+
+    def submit_queued(self):
+        # Keep only as many files in flight as there are workers, the rest wait their turn
+        while self.queue and len(self.in_flight) < self.max_workers:
+            key = self.queue.popleft()
+            self.log_signal.emit(f"Decoding {Path(key[0]).name}...")
+            source_out = str(Path(self.output_folder) / Path(key[0]).stem)
+            future = self.executor.submit(decode_file, key[0], source_out, self.use_mmap, check_cancel,
+                                          self.digests, self.dedupe, self.decompress)
+            self.in_flight.add(key)
+            future.add_done_callback(lambda future, key=key: self.decoded_signal.emit(key, future))
+        self.report()
+
+    def on_decoded(self, key, future):
+        self.in_flight.discard(key)
+        name = Path(key[0]).name
+        try:
+            result = future.result()
+        except JobCancelled:
+            # Forgotten like the queued files, the next start decodes it from scratch
+            self.journal.release(key)
+            self.log_signal.emit(f"{name}: Cancelled, partial output removed")
+        except Exception as e:
+            self.failed += 1
+            self.journal.finish(key, error=str(e))
+            self.log_signal.emit(f"{name}: Error: {str(e)}")
+        else:
+            self.decoded += 1
+            self.journal.finish(key, result.path)
+            self.log_signal.emit(f"{name} -> {describe_output(result)}")
+        if self.stopping:
+            if not self.in_flight:
+                self.stop()
+            return
+        self.submit_queued()
+
+    def report(self):
+        done = self.decoded + self.failed
+        waiting = len(self.queue) + len(self.in_flight)
+        percent = 100 * done // (done + waiting) if waiting else 100
+        self.progress_signal.emit(percent, f"{self.decoded} decoded, {self.failed} failed, {waiting} waiting")
+
+    def requestInterruption(self):
+        """Stop watching. Queued files are left for the next start, the ones in flight stop within a chunk."""
+        self.stopping = True
+        self.watcher.removePaths(self.watcher.files() + self.watcher.directories())
+        for _, _, timer in self.settling.values():
+            timer.stop()
+        self.settling.clear()
+        while self.queue:
+            self.journal.release(self.queue.popleft())
+        if self.in_flight:
+            self.cancel.set()
+            self.log_signal.emit(f"Stopping, cancelling {len(self.in_flight)} files in flight...")
+        else:
+            self.stop()
+
+    def stop(self):
+        self.executor.shutdown(wait=False)
+        self.journal.close()
+        self.log_signal.emit(f"Stopped watching: {self.decoded} decoded, {self.failed} failed")
+        self.finished_signal.emit("")
+
+
+class Base64Input(QPlainTextEdit):
+    """Source input box that hands large pastes over as a QByteArray instead of laying out the text."""
+    large_paste_signal = pyqtSignal(object)
+
+    def insertFromMimeData(self, source):
+        payload = source.data("text/plain")
+        if payload.size() > LARGE_PASTE_SIZE and not self.isReadOnly():
+            self.large_paste_signal.emit(payload)
+        else:
+            super().insertFromMimeData(source)
 
 
 class LogOutput(QTextEdit):
@@ -96,16 +534,73 @@ class MainWindow(QWidget):
         # Input mode selector (File vs Text)
         self.file_mode_radio = QRadioButton("File Mode", self)
         self.text_mode_radio = QRadioButton("Text Mode", self)
+        self.batch_mode_radio = QRadioButton("Batch Mode", self)
+        self.batch_mode_radio.setToolTip("Decode every .txt file of a folder, or the files matching a glob pattern")
+        self.encode_mode_radio = QRadioButton("Encode Mode", self)
+        self.encode_mode_radio.setToolTip("Encode any file to base64 text")
+        self.scan_mode_radio = QRadioButton("Scan Mode", self)
+        self.scan_mode_radio.setToolTip("Extract the base64 and data: URIs embedded in a JSON, HTML or log file")
+        self.watch_mode_radio = QRadioButton("Watch Mode", self)
+        self.watch_mode_radio.setToolTip("Decode every .txt file written into a folder, until cancelled")
         self.text_mode_radio.setChecked(True)  # Default to File Mode
 
         mode_selector_layout = QHBoxLayout()
         mode_selector_layout.addWidget(self.file_mode_radio)
         mode_selector_layout.addWidget(self.text_mode_radio)
+        mode_selector_layout.addWidget(self.batch_mode_radio)
+        mode_selector_layout.addWidget(self.encode_mode_radio)
+        mode_selector_layout.addWidget(self.scan_mode_radio)
+        mode_selector_layout.addWidget(self.watch_mode_radio)
+
+        # Memory-mapped reading for File Mode
+        self.mmap_checkbox = QCheckBox("Memory-map input file", self)
+        self.mmap_checkbox.setChecked(True)
+        mode_selector_layout.addWidget(self.mmap_checkbox)
+
+        # Multi-process decoding of large files in File Mode
+        self.parallel_checkbox = QCheckBox("Parallel decode", self)
+        self.parallel_checkbox.setToolTip(f"Decode files over {PARALLEL_MIN_SIZE // (1024 * 1024)} MB on all CPU cores")
+        mode_selector_layout.addWidget(self.parallel_checkbox)
         layout.addLayout(mode_selector_layout)
 
+        # Checksums and content-addressed storage of decoded files (SHA-256 is always computed)
+        output_options_layout = QHBoxLayout()
+        self.md5_checkbox = QCheckBox("MD5", self)
+        self.crc32_checkbox = QCheckBox("CRC32", self)
+        self.dedupe_checkbox = QCheckBox("Content-addressed output (skip duplicates)", self)
+        self.dedupe_checkbox.setToolTip("Name decoded files by their SHA-256 and keep one copy of identical content")
+        self.unpack_checkbox = QCheckBox("Unpack gzip/zip", self)
+        self.unpack_checkbox.setToolTip("Write gzip payloads decompressed and extract zip archives into a folder")
+        for checkbox in (self.md5_checkbox, self.crc32_checkbox, self.dedupe_checkbox, self.unpack_checkbox):
+            output_options_layout.addWidget(checkbox)
+        layout.addLayout(output_options_layout)
+
+        # Output options of Encode Mode
+        self.wrap_checkbox = QCheckBox(f"Wrap lines at {MIME_LINE_LENGTH}", self)
+        self.urlsafe_checkbox = QCheckBox("URL-safe alphabet", self)
+        self.data_uri_checkbox = QCheckBox("Data URI", self)
+        encode_options_layout = QHBoxLayout()
+        for checkbox in (self.wrap_checkbox, self.urlsafe_checkbox, self.data_uri_checkbox):
+            checkbox.setEnabled(False)
+            encode_options_layout.addWidget(checkbox)
+
+        # Option of Scan Mode
+        self.min_length_label = QLabel("Minimum base64 length:", self)
+        self.min_length_spin = QSpinBox(self)
+        self.min_length_spin.setRange(16, 1024 * 1024)
+        self.min_length_spin.setValue(MIN_BLOB_LENGTH)
+        for widget in (self.min_length_label, self.min_length_spin):
+            widget.setEnabled(False)
+            encode_options_layout.addWidget(widget)
+        layout.addLayout(encode_options_layout)
+
         self.mode_group = QButtonGroup(self)
         self.mode_group.addButton(self.file_mode_radio)
         self.mode_group.addButton(self.text_mode_radio)
+        self.mode_group.addButton(self.batch_mode_radio)
+        self.mode_group.addButton(self.encode_mode_radio)
+        self.mode_group.addButton(self.scan_mode_radio)
+        self.mode_group.addButton(self.watch_mode_radio)
         self.mode_group.buttonClicked.connect(self.on_mode_change)  # Add mode change handler
 
         # Input fields with Browse buttons
@@ -117,10 +612,25 @@ class MainWindow(QWidget):
         self.log_output.setFixedHeight(250)  # Set console message height
         layout.addWidget(self.log_output)
 
-        # Process button
+        # Process buttons
+        buttons_layout = QHBoxLayout()
         self.process_button = QPushButton("Process")
         self.process_button.clicked.connect(self.process_file)
-        layout.addWidget(self.process_button)
+        buttons_layout.addWidget(self.process_button)
+        self.clipboard_button = QPushButton("Decode Clipboard")
+        self.clipboard_button.setToolTip("Decode the base64 text on the clipboard without pasting it")
+        self.clipboard_button.clicked.connect(self.decode_clipboard)
+        buttons_layout.addWidget(self.clipboard_button)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        buttons_layout.addWidget(self.cancel_button)
+        layout.addLayout(buttons_layout)
+
+        # Progress of the running job
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        layout.addWidget(self.progress_bar)
         layout.setAlignment(Qt.AlignTop)
 
         # Set the layout to the window
@@ -132,7 +642,7 @@ class MainWindow(QWidget):
 
         label = QLabel(label_text)
         input_layout = QHBoxLayout()
-        input_field = QPlainTextEdit() if is_input else QLineEdit()
+        input_field = Base64Input() if is_input else QLineEdit()
 
         browse_button = QPushButton("Browse") if is_input else QPushButton("Browse Folder")
         if is_input:
@@ -141,6 +651,10 @@ class MainWindow(QWidget):
             self.source_in = input_field
             self.source_in_b = browse_button
             browse_button.setDisabled(True)
+            # Large pastes are decoded from the clipboard data, any edit drops them again
+            self.pasted_payload = None
+            input_field.large_paste_signal.connect(self.use_pasted_payload)
+            input_field.textChanged.connect(self.drop_pasted_payload)
         else:
             browse_button.clicked.connect(lambda: self.browse_folder(input_field))
             input_field.setText("D:\AAAA")
@@ -157,8 +671,14 @@ class MainWindow(QWidget):
 
     def on_mode_change(self):
         """Handles changes between File Mode and Text Mode."""
-        if self.file_mode_radio.isChecked():
-            # Resize the source input field for File Mode (smaller)
+        is_encode_mode = self.encode_mode_radio.isChecked()
+        for checkbox in (self.wrap_checkbox, self.urlsafe_checkbox, self.data_uri_checkbox):
+            checkbox.setEnabled(is_encode_mode)
+        for widget in (self.min_length_label, self.min_length_spin):
+            widget.setEnabled(self.scan_mode_radio.isChecked())
+
+        if not self.text_mode_radio.isChecked():
+            # Resize the source input field for the file based modes (smaller)
             self.source_in.setFixedHeight(30)
             self.source_in.clear()
             self.source_in_b.setDisabled(False)
@@ -169,12 +689,30 @@ class MainWindow(QWidget):
             self.source_in_b.setDisabled(True)
 
     def browse_file(self, input_field):
-        """Opens a file dialog to select a file."""
-        file_path, _ = QFileDialog.getOpenFileName(self, "Select text file content base64", "*.txt")
+        """Opens a file dialog to select a file, or a folder dialog in Batch and Watch Mode."""
+        if self.watch_mode_radio.isChecked():
+            # The output goes elsewhere, decoded text files would be picked up again
+            folder_path = QFileDialog.getExistingDirectory(self, "Select folder to watch for base64 text files")
+            if folder_path:
+                input_field.setPlainText(folder_path)
+            return
+        if self.batch_mode_radio.isChecked():
+            folder_path = QFileDialog.getExistingDirectory(self, "Select folder of base64 text files")
+            if folder_path:
+                input_field.setPlainText(folder_path)
+                if not self.source_out.text().strip():
+                    self.source_out.setText(folder_path)
+            return
+        if self.encode_mode_radio.isChecked():
+            file_path, _ = QFileDialog.getOpenFileName(self, "Select file to encode")
+        elif self.scan_mode_radio.isChecked():
+            file_path, _ = QFileDialog.getOpenFileName(self, "Select file to scan for base64")
+        else:
+            file_path, _ = QFileDialog.getOpenFileName(self, "Select text file content base64", "*.txt")
         if file_path:
             input_field.setPlainText(file_path)
-            # Automatically set the output folder to the folder containing the input file (File Mode)
-            if self.file_mode_radio.isChecked():
+            # Automatically set the output folder to the folder containing the input file (all but Text Mode)
+            if not self.text_mode_radio.isChecked():
                 self.source_out.setText(str(Path(file_path).parent))
 
     def browse_folder(self, input_field):
@@ -183,33 +721,105 @@ class MainWindow(QWidget):
         if folder_path:
             input_field.setText(folder_path)
     
+    def use_pasted_payload(self, payload):
+        """Keep the pasted QByteArray for Text Mode, showing only its start and size."""
+        preview = payload.left(PREVIEW_LENGTH).data().decode("ascii", errors="replace")
+        self.source_in.blockSignals(True)
+        self.source_in.setPlainText(f"{preview}... [{payload.size() / (1024 * 1024):.1f} MB pasted, not shown]")
+        self.source_in.blockSignals(False)
+        self.pasted_payload = payload
+
+    def drop_pasted_payload(self):
+        self.pasted_payload = None
+
+    def decode_clipboard(self):
+        """Decode the clipboard's text in Text Mode, the text box only gets a preview of it."""
+        payload = QApplication.clipboard().mimeData().data("text/plain")
+        if payload.isEmpty():
+            QMessageBox.warning(self, "Input Error", "The clipboard holds no text.")
+            return
+        if not self.text_mode_radio.isChecked():
+            self.text_mode_radio.setChecked(True)
+            self.on_mode_change()
+        self.use_pasted_payload(payload)
+        self.process_file()
+
     def process_file(self):
         is_file_mode = self.file_mode_radio.isChecked()
         source_in = self.source_in.toPlainText().strip()
+        if self.text_mode_radio.isChecked() and self.pasted_payload is not None:
+            source_in = self.pasted_payload
         file_name = Path(source_in).stem if is_file_mode else "output"
         source_out = self.source_out.text().strip() + "/" + file_name
 
         if not source_in or not source_out:
             QMessageBox.warning(self, "Input Error", "Please provide both input and output paths.")
             return
+        if self.watch_mode_radio.isChecked():
+            if not Path(source_in).is_dir():
+                QMessageBox.warning(self, "Input Error", "Watch Mode needs a folder to watch.")
+                return
+            if Path(source_in).resolve() == Path(self.source_out.text().strip()).resolve():
+                QMessageBox.warning(self, "Input Error", "Choose an output folder other than the watched one.")
+                return
 
         self.log_output.append("Processing started...")
         self.process_button.setEnabled(False)
+        self.clipboard_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%p%")
+
+        # SHA-256 is always computed while writing, MD5 and CRC32 on request
+        digests = ("sha256",) + (("md5",) if self.md5_checkbox.isChecked() else ()) \
+            + (("crc32",) if self.crc32_checkbox.isChecked() else ())
+        dedupe = self.dedupe_checkbox.isChecked()
+        decompress = self.unpack_checkbox.isChecked()
 
         # Start the background thread
-        self.thread = FileProcessingThread(source_in, source_out, is_file_mode)
+        if self.encode_mode_radio.isChecked():
+            # Keep the full name, report.pdf becomes report.pdf.txt
+            source_out = self.source_out.text().strip() + "/" + Path(source_in).name
+            line_length = MIME_LINE_LENGTH if self.wrap_checkbox.isChecked() else 0
+            self.thread = EncodeProcessingThread(source_in, source_out, line_length, self.urlsafe_checkbox.isChecked(),
+                                                 self.data_uri_checkbox.isChecked())
+        elif self.scan_mode_radio.isChecked():
+            self.thread = ScanProcessingThread(source_in, self.source_out.text().strip(), self.min_length_spin.value(),
+                                               digests, dedupe, decompress)
+        elif self.watch_mode_radio.isChecked():
+            self.thread = FolderWatcher(source_in, self.source_out.text().strip(), self.mmap_checkbox.isChecked(),
+                                        None, digests, dedupe, decompress)
+        elif self.batch_mode_radio.isChecked():
+            self.thread = BatchProcessingThread(source_in, self.source_out.text().strip(), self.mmap_checkbox.isChecked(),
+                                                None, digests, dedupe, decompress)
+        else:
+            self.thread = FileProcessingThread(source_in, source_out, is_file_mode, self.mmap_checkbox.isChecked(),
+                                               self.parallel_checkbox.isChecked(), digests, dedupe, decompress)
         self.thread.log_signal.connect(self.update_log)
+        self.thread.progress_signal.connect(self.update_progress)
         self.thread.finished_signal.connect(self.processing_finished)
         self.thread.start()
 
     def update_log(self, message):
         self.log_output.append(message)
 
+    def update_progress(self, percent, text):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"%p%  {text}")
+
+    def cancel_processing(self):
+        """Ask the running job to stop, it does so before its next chunk."""
+        self.thread.requestInterruption()
+        self.cancel_button.setEnabled(False)
+        self.log_output.append("Cancelling...")
+
     def processing_finished(self, output_file_path):
         self.log_output.append(f"Processing finished.")
         if output_file_path:
             self.log_output.append(f"Output file saved at: {output_file_path}")
         self.process_button.setEnabled(True)
+        self.clipboard_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
 
     def center(self):
         frame_geometry = self.frameGeometry()
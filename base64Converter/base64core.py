@@ -0,0 +1,882 @@
+"""Decode, sniff and write core of the Base64 converter, without any Qt.
+
+The GUI runs these in its worker threads; they work the same from scripts and on the command line:
+
+    python base64core.py decode export.txt -o report      # writes report.<detected extension>
+    curl -s https://host/export | python base64core.py decode --unpack > payload.json
+    python base64core.py encode report.pdf --wrap > report.txt
+
+Input and output stream in CHUNK_SIZE blocks, so memory use stays flat whatever the size.
+libmagic is only imported when a file type is not in SIGNATURES.
+"""
+import argparse
+import contextlib
+import os
+import sys
+import mmap
+import re
+import zlib
+import struct
+import base64
+import hashlib
+import binascii
+import itertools
+from collections import namedtuple
+from pathlib import Path
+
+# Bytes of base64 text read per step. Memory use stays around this size whatever the input size is
+CHUNK_SIZE = 4 * 1024 * 1024
+
+BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+# Every byte that is not base64 (newlines, spaces, stray characters), dropped like b64decode does by default
+NON_BASE64_BYTES = bytes(byte for byte in range(256) if byte not in BASE64_ALPHABET)
+
+# Files below this size are decoded serially, the pool start-up would cost more than it saves
+PARALLEL_MIN_SIZE = 32 * 1024 * 1024
+# Base64 text sniffed for the file type before a parallel decode (a multiple of 4)
+SNIFF_SIZE = 64 * 1024
+
+# Line length of MIME-wrapped base64 (RFC 2045)
+MIME_LINE_LENGTH = 76
+# Maps the standard alphabet's last two characters to the URL and filename safe ones
+URLSAFE_TABLE = bytes.maketrans(b"+/", b"-_")
+
+# Shortest base64 run Scan Mode extracts; shorter ones are mostly identifiers, hashes and words
+MIN_BLOB_LENGTH = 256
+# A base64 run, and what may continue one cut off at the end of the previous read
+BASE64_RUN = re.compile(rb"[A-Za-z0-9+/]+=*")
+RUN_CONTINUATION = re.compile(rb"[A-Za-z0-9+/]*=*")
+PADDING_CONTINUATION = re.compile(rb"=*")
+# The data: URI header right in front of a run, and how far back to look for it
+DATA_URI_PREFIX = re.compile(rb"data:([\w.+-]+/[\w.+-]+)(?:;[\w.+-]+=[\w.+-]+)*;base64,$")
+PREFIX_LOOKBEHIND = 256
+
+# One written output. digests maps sha256/md5/crc32 to hex strings, duplicate is set when content
+# addressing found the same content already stored (path is then that file). unpacked counts the
+# files taken out of a gzip stream or zip archive (path is then the folder for a zip)
+DecodedFile = namedtuple("DecodedFile", ["path", "file_type", "digests", "duplicate", "unpacked"], defaults=[0])
+
+# Line breaks and spaces that wrapped base64 commonly contains
+WHITESPACE = (b"\n", b"\r", b" ", b"\t")
+
+# Decoded bytes the file type is detected from
+HEADER_SIZE = 8 * 1024
+
+# (offset, magic number, MIME type) checked before falling back to libmagic
+SIGNATURES = (
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"PK\x05\x06", "application/zip"),  # Empty archive
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"Rar!\x1a\x07", "application/x-rar"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"BZh", "application/x-bzip2"),
+    (0, b"\xfd7zXZ\x00", "application/x-xz"),
+    (0, b"\x28\xb5\x2f\xfd", "application/zstd"),
+    (0, b"SQLite format 3\x00", "application/vnd.sqlite3"),
+    (0, b"\x7fELF", "application/x-executable"),
+    (4, b"ftypqt", "video/quicktime"),
+    # Only the MP4 brands: HEIC, AVIF, M4A and other ISO media files share the ftyp box
+    (4, b"ftypisom", "video/mp4"),
+    (4, b"ftypmp41", "video/mp4"),
+    (4, b"ftypmp42", "video/mp4"),
+    (4, b"ftypavc1", "video/mp4"),
+    (4, b"ftypM4V", "video/mp4"),
+    (8, b"WAVE", "audio/x-wav"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"ID3", "audio/mpeg"),
+)
+
+# Office Open XML parts, recognised by the folder their entries are in
+OOXML_FOLDERS = (
+    (b"word/", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    (b"xl/", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    (b"ppt/", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
+)
+
+# Map common MIME types to file extensions
+MIME_TO_EXTENSION = {
+    "application/zip": "zip",
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "application/pdf": "pdf",
+    "application/x-7z-compressed": "7z",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/tiff": "tif",
+    "application/x-rar": "rar",
+    "application/gzip": "gz",
+    "application/x-bzip2": "bz2",
+    "application/x-xz": "xz",
+    "application/zstd": "zst",
+    "application/vnd.sqlite3": "sqlite",
+    "video/quicktime": "mov",
+    "video/mp4": "mp4",
+    "audio/x-wav": "wav",
+    "audio/ogg": "ogg",
+    "audio/flac": "flac",
+    "audio/mpeg": "mp3",
+    "application/java-archive": "jar",
+    "application/epub+zip": "epub",
+    "application/vnd.oasis.opendocument.text": "odt",
+    "application/vnd.oasis.opendocument.spreadsheet": "ods",
+    "application/vnd.oasis.opendocument.presentation": "odp",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": "pptx",
+    "application/json": "json",
+    "application/xml": "xml",
+    "text/xml": "xml",
+    "text/html": "html",
+    "text/csv": "csv",
+}
+
+# Zip local file header, and how much compressed data is fed to the decompressor at a time
+ZIP_LOCAL_HEADER = struct.Struct("<4s5H3I2H")
+ZIP_READ_SIZE = 64 * 1024
+
+
+def sniff_zip(header):
+    """Tell Office, OpenDocument, EPUB and JAR files apart from plain zip archives by their entry names."""
+    names = []
+    position = 0
+    while 0 <= position and position + 30 <= len(header):
+        name_length = int.from_bytes(header[position + 26:position + 28], "little")
+        extra_length = int.from_bytes(header[position + 28:position + 30], "little")
+        names.append(header[position + 30:position + 30 + name_length])
+        if not position and names[0] == b"mimetype":
+            # OpenDocument and EPUB store their MIME type uncompressed as the first entry
+            content = header[30 + name_length + extra_length:][:80].split(b"PK\x03\x04")[0]
+            if content.startswith(b"application/"):
+                return content.decode("ascii", errors="ignore").strip()
+        position = header.find(b"PK\x03\x04", position + 30)
+
+    if names and names[0].startswith(b"META-INF/"):
+        return "application/java-archive"
+    for folder, file_type in OOXML_FOLDERS:
+        if any(name.startswith(folder) for name in names):
+            return file_type
+    return "application/zip"
+
+
+def sniff_mime(data):
+    """MIME type of the decoded data, from its first HEADER_SIZE bytes.
+
+    The signature table covers the common types; libmagic is imported and asked only for anything
+    else, and when it isn't installed the data counts as application/octet-stream.
+    """
+    header = data[:HEADER_SIZE]
+    for offset, signature, file_type in SIGNATURES:
+        if header.startswith(signature, offset):
+            return sniff_zip(header) if file_type == "application/zip" else file_type
+    try:
+        # pip install python-magic-bin
+        import magic
+    except ImportError:
+        return "application/octet-stream"
+    return magic.from_buffer(header, mime=True)
+
+
+class JobCancelled(Exception):
+    """Raised from a progress callback once the user cancelled the job."""
+
+
+# Inside a pool worker: the Event the parent sets to cancel the jobs in flight, see watch_cancel()
+cancel_event = None
+
+
+def watch_cancel(event):
+    """ProcessPoolExecutor initializer, keeps the parent's cancel Event for check_cancel()."""
+    global cancel_event
+    cancel_event = event
+
+
+def check_cancel(done=None):
+    """Progress callback for jobs run in a pool: raises JobCancelled once the parent set the cancel Event."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled()
+
+
+def track_progress(chunks, progress):
+    """Pass the chunks through, calling progress with the byte count before each one and after the last."""
+    done = 0
+    for chunk in chunks:
+        progress(done)
+        yield chunk
+        done += len(chunk)
+    progress(done)
+
+
+def decode_stream(chunks):
+    """Decode an iterable of base64 byte chunks, yielding the decoded bytes block by block.
+
+    Characters outside the alphabet are dropped first, and whatever doesn't fill a whole
+    4-character group is carried over to the next chunk, so line breaks may fall anywhere.
+    """
+    carry = b""
+    for chunk in chunks:
+        data = carry + chunk.translate(None, NON_BASE64_BYTES)
+        cut = len(data) - len(data) % 4
+        carry = data[cut:]
+        if cut:
+            yield base64.b64decode(data[:cut])
+    if carry:
+        # An incomplete final group raises the usual "Incorrect padding" error
+        yield base64.b64decode(carry)
+
+
+def decode_mapped(mapped, chunk_size=CHUNK_SIZE, progress=None):
+    """Decode a memory-mapped base64 file, yielding the decoded bytes block by block.
+
+    Windows without whitespace are decoded straight from a memoryview of the mapping, so the input
+    is never copied. Windows with line breaks (or a carried partial group) take the decode_stream
+    route of stripping and re-aligning just that window. progress is called with the input
+    position before each window and at the end.
+    """
+    size = len(mapped)
+    carry = b""
+    with memoryview(mapped) as view:
+        for start in range(0, size, chunk_size):
+            if progress:
+                progress(start)
+            end = min(start + chunk_size, size)
+            if not carry and (end - start) % 4 == 0 and all(mapped.find(space, start, end) < 0 for space in WHITESPACE):
+                try:
+                    yield binascii.a2b_base64(view[start:end])
+                    continue
+                except binascii.Error:
+                    pass  # Stray characters broke the alignment, fall back to stripping them
+            data = carry + view[start:end].tobytes().translate(None, NON_BASE64_BYTES)
+            cut = len(data) - len(data) % 4
+            carry = data[cut:]
+            if cut:
+                yield base64.b64decode(data[:cut])
+    if carry:
+        yield base64.b64decode(carry)
+    if progress:
+        progress(size)
+
+
+def count_segment(path, start, end):
+    """Number of base64 characters between the two byte positions of the file."""
+    count = 0
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for window in range(start, end, CHUNK_SIZE):
+            count += len(mapped[window:min(window + CHUNK_SIZE, end)].translate(None, NON_BASE64_BYTES))
+    return count
+
+
+def decode_segment(path, output_path, start, end, skip, extra, offset):
+    """Decode one segment of the file and write it at its offset of the output file.
+
+    The first skip characters belong to the previous segment's last group and the extra characters
+    following the segment complete this one's last group. Returns the number of bytes written.
+    """
+    written = 0
+    carry = b""
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            open(output_path, "r+b") as output_file:
+        output_file.seek(offset)
+        for window in range(start, end, CHUNK_SIZE):
+            check_cancel()
+            data = carry + mapped[window:min(window + CHUNK_SIZE, end)].translate(None, NON_BASE64_BYTES)
+            if skip:
+                dropped = min(skip, len(data))
+                data = data[dropped:]
+                skip -= dropped
+            cut = len(data) - len(data) % 4
+            carry = data[cut:]
+            if cut:
+                written += output_file.write(base64.b64decode(data[:cut]))
+
+        position = end
+        while extra and position < len(mapped):
+            tail = mapped[position:position + 64].translate(None, NON_BASE64_BYTES)[:extra]
+            carry += tail
+            extra -= len(tail)
+            position += 64
+        if carry:
+            written += output_file.write(base64.b64decode(carry))
+    return written
+
+
+def decode_parallel(path, output_path, workers=None, progress=None, checksums=None):
+    """Decode a base64 file across a process pool into output_path, byte-identical to decode_mapped.
+
+    A first pass counts the base64 characters of every segment, which gives each segment's
+    4-character aligned share of the text and so the exact offset its output goes to. Every worker
+    maps the input itself and writes its part straight into the preallocated output file. Returns
+    the output size, or None when a segment decoded to an unexpected length (padding in the middle
+    of the text); the serial decode is the reference for such input. progress is called with the
+    input position as the segments complete; when it raises, the segments still decoding stop within
+    a chunk and the ones not yet started are dropped. checksums, a Checksums, is fed each segment's
+    output in order as it completes, while the page cache still holds it and the later segments are
+    still decoding; it is only complete when the output size is returned.
+    """
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(path)
+    # A few segments per worker keep all of them busy when some finish early
+    segment_size = max(CHUNK_SIZE, -(-size // (workers * 4)))
+    bounds = [(start, min(start + segment_size, size)) for start in range(0, size, segment_size)]
+    if not bounds:
+        open(output_path, "wb").close()
+        return 0
+
+    # Imported here, multiprocessing would add more to the start-up than anything else
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    cancel = multiprocessing.Event()
+    with ProcessPoolExecutor(max_workers=workers, initializer=watch_cancel, initargs=(cancel,)) as executor:
+        counts = list(executor.map(count_segment, [path] * len(bounds), *zip(*bounds)))
+
+        # Segment i owns the characters from its first group boundary up to the next segment's
+        totals = [0]
+        for count in counts:
+            totals.append(totals[-1] + count)
+        aligned = [-(-total // 4) * 4 for total in totals[:-1]] + [totals[-1]]
+        with open(output_path, "wb") as output_file:
+            output_file.truncate(totals[-1] // 4 * 3)
+
+        futures = []
+        for index, (start, end) in enumerate(bounds):
+            skip = aligned[index] - totals[index]
+            extra = aligned[index + 1] - totals[index + 1]
+            futures.append(executor.submit(decode_segment, path, output_path, start, end, skip, extra,
+                                           aligned[index] // 4 * 3))
+        written = []
+        try:
+            # Unbuffered, a read-ahead would keep the next segment's bytes from before they were written
+            with open(output_path, "rb", buffering=0) as output_file:
+                for index, (future, (_, end)) in enumerate(zip(futures, bounds)):
+                    written.append(future.result())
+                    if checksums is not None:
+                        output_file.seek(aligned[index] // 4 * 3)
+                        remaining = written[-1]
+                        while remaining:
+                            block = output_file.read(min(CHUNK_SIZE, remaining))
+                            if not block:
+                                break
+                            checksums.update(block)
+                            remaining -= len(block)
+                    if progress:
+                        progress(end)
+        except BaseException:
+            # Stop the segments already decoding too, or leaving the pool would wait for all of them
+            cancel.set()
+            for future in futures:
+                future.cancel()
+            raise
+
+    for index, length in enumerate(written[:-1]):
+        if length != (aligned[index + 1] - aligned[index]) // 4 * 3:
+            return None
+    output_size = aligned[-2] // 4 * 3 + written[-1]
+    with open(output_path, "r+b") as output_file:
+        output_file.truncate(output_size)
+    return output_size
+
+
+def encode_stream(chunks, line_length=0, urlsafe=False):
+    """Encode an iterable of byte chunks to base64, yielding the text block by block.
+
+    Whatever doesn't fill a whole 3-byte group (a whole line when wrapping) is carried over to the
+    next chunk, so only the final block carries padding. With a line_length (a multiple of 4) every
+    line, the last one included, ends in a newline, like base64.encodebytes.
+    """
+    group = line_length // 4 * 3 if line_length else 3
+    carry = b""
+    last = False
+    chunks = iter(chunks)
+    while not last:
+        chunk = next(chunks, None)
+        last = chunk is None
+        data = carry + chunk if chunk else carry
+        cut = len(data) if last else len(data) - len(data) % group
+        carry = data[cut:]
+        if not cut:
+            continue
+        text = base64.b64encode(data[:cut])
+        if urlsafe:
+            text = text.translate(URLSAFE_TABLE)
+        if line_length:
+            text = b"\n".join([text[start:start + line_length] for start in range(0, len(text), line_length)]) + b"\n"
+        yield text
+
+
+def scan_blobs(chunks, min_length=MIN_BLOB_LENGTH):
+    """Find the base64 runs of at least min_length characters in a stream of arbitrary bytes.
+
+    Yields (blob number, offset of the run, type declared by a data: URI or None, text) for every
+    piece of every run, in order; a run cut off at the end of a read continues into the next one,
+    so a long run comes as several pieces and memory stays bounded by the read size. Unpadded runs
+    get their padding appended as a last piece.
+    """
+    blob = 0
+    offset = 0
+    lookbehind = b""
+    run = None  # [offset, declared type, pieces held back until min_length is reached, length, padded]
+
+    def extend(text):
+        """Pieces of the open run that can be yielded, holding them back until the run is long enough."""
+        if not text:
+            return []
+        run[3] += len(text)
+        run[4] = run[4] or b"=" in text
+        if run[2] is None:
+            return [text]
+        run[2].append(text)
+        if run[3] < min_length:
+            return []
+        held, run[2] = run[2], None
+        return held
+
+    def close():
+        """Padding that completes the open run's last group, if it was long enough to be yielded."""
+        if run[2] is not None or run[4] or not run[3] % 4:
+            return []
+        return [b"=" * (-run[3] % 4)]
+
+    for chunk in chunks:
+        position = 0
+        if run is not None:
+            continuation = (PADDING_CONTINUATION if run[4] else RUN_CONTINUATION).match(chunk)
+            position = continuation.end()
+            pieces = extend(continuation.group())
+            if position < len(chunk):
+                pieces += close()
+            for text in pieces:
+                yield blob, run[0], run[1], text
+            if position < len(chunk):
+                run = None
+
+        if run is None:
+            for match in BASE64_RUN.finditer(chunk, position):
+                start, end = match.span()
+                cut_off = end == len(chunk)
+                # Short runs are skipped unless the read cut them off, then they may still grow long enough
+                if end - start < min_length and not cut_off:
+                    continue
+                context = (lookbehind + chunk[max(0, start - PREFIX_LOOKBEHIND):start])[-PREFIX_LOOKBEHIND:]
+                prefix = DATA_URI_PREFIX.search(context)
+                blob += 1
+                run = [offset + start, prefix.group(1).decode("ascii") if prefix else None, [], 0, False]
+                pieces = extend(match.group())
+                if not cut_off:
+                    pieces += close()
+                for text in pieces:
+                    yield blob, run[0], run[1], text
+                if not cut_off:
+                    run = None
+
+        offset += len(chunk)
+        lookbehind = (lookbehind + chunk[-PREFIX_LOOKBEHIND:])[-PREFIX_LOOKBEHIND:]
+
+    if run is not None:
+        for text in close():
+            yield blob, run[0], run[1], text
+
+
+class BlockReader:
+    """Read exact sizes from an iterator of byte blocks, without joining the blocks up."""
+
+    def __init__(self, blocks):
+        self.blocks = iter(blocks)
+        self.block = b""
+        self.position = 0
+
+    def read1(self, size):
+        """Up to size bytes from the current block, b"" at the end of the stream."""
+        while self.position >= len(self.block):
+            block = next(self.blocks, None)
+            if block is None:
+                return b""
+            self.block, self.position = block, 0
+        data = self.block[self.position:self.position + size]
+        self.position += len(data)
+        return data
+
+    def read(self, size):
+        """size bytes, fewer only at the end of the stream."""
+        pieces = []
+        while size:
+            data = self.read1(size)
+            if not data:
+                break
+            pieces.append(data)
+            size -= len(data)
+        return b"".join(pieces)
+
+    def unread(self, size):
+        """Step back over the last size bytes returned by read1()."""
+        self.position -= size
+
+
+def gunzip_blocks(blocks):
+    """Decompress a stream of gzip members block by block, the output blocks never exceeding CHUNK_SIZE."""
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    for data in blocks:
+        while True:
+            output = decompressor.decompress(data, CHUNK_SIZE)
+            if output:
+                yield output
+            data = decompressor.unconsumed_tail
+            if decompressor.eof:
+                data = decompressor.unused_data
+                if not data.strip(b"\0"):
+                    # Zero padding after the last member, as some tools write
+                    break
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            if not data and len(output) < CHUNK_SIZE:
+                break
+    if not decompressor.eof:
+        raise ValueError("Truncated gzip stream")
+
+
+def unzip_blocks(blocks, folder):
+    """Extract a zip archive read front to back from a stream of blocks into folder.
+
+    Only the local headers are used, the central directory at the end is never needed, so nothing
+    has to be seekable. Stored and deflated entries are supported, CRCs are checked. Returns the
+    number of files extracted. When the archive turns out broken, or the job is cancelled, every
+    file and folder extracted so far is removed again.
+    """
+    created = []
+    try:
+        return extract_entries(BlockReader(blocks), Path(folder).resolve(), created)
+    except BaseException:
+        # Newest first, so folders are empty by the time they come up
+        for path in reversed(created):
+            if path.is_dir():
+                path.rmdir()
+            else:
+                path.unlink(missing_ok=True)
+        raise
+
+
+def make_folders(folder, created):
+    """mkdir -p that appends every folder it creates to created, outermost first."""
+    missing = []
+    while not folder.exists():
+        missing.append(folder)
+        folder = folder.parent
+    for path in reversed(missing):
+        path.mkdir()
+        created.append(path)
+
+
+def extract_entries(reader, root, created):
+    """The entry loop of unzip_blocks, appending every path it creates to created."""
+    extracted = 0
+    while True:
+        header = reader.read(ZIP_LOCAL_HEADER.size)
+        if len(header) < ZIP_LOCAL_HEADER.size or not header.startswith(b"PK\x03\x04"):
+            # The central directory (or the end) follows the last entry
+            return extracted
+        _, _, flags, method, _, _, crc, compressed_size, size, name_length, extra_length = ZIP_LOCAL_HEADER.unpack(header)
+        name = reader.read(name_length).decode("utf-8" if flags & 0x800 else "cp437")
+        extra = reader.read(extra_length)
+        zip64 = False
+        while len(extra) >= 4:
+            field, length = struct.unpack("<HH", extra[:4])
+            if field == 0x0001:
+                # ZIP64 sizes replace the 0xFFFFFFFF placeholders, in this order
+                zip64 = True
+                values = iter(struct.unpack(f"<{length // 8}Q", extra[4:4 + length // 8 * 8]))
+                if size == 0xFFFFFFFF:
+                    size = next(values)
+                if compressed_size == 0xFFFFFFFF:
+                    compressed_size = next(values)
+            extra = extra[4 + length:]
+
+        if flags & 0x1:
+            raise ValueError(f"Encrypted zip entry: {name}")
+        if method not in (0, 8):
+            raise ValueError(f"Unsupported compression method {method}: {name}")
+        has_descriptor = bool(flags & 0x8)
+        is_folder = name.endswith("/")
+        if method == 0 and has_descriptor and not is_folder:
+            raise ValueError(f"Stored entry of unknown size can't be streamed: {name}")
+
+        target = (root / name).resolve()
+        if root != target and root not in target.parents:
+            raise ValueError(f"Zip entry outside the output folder: {name}")
+        make_folders(target if is_folder else target.parent, created)
+        if is_folder:
+            output_file = None
+        else:
+            output_file = open(target, "wb")
+            created.append(target)
+
+        running_crc = 0
+        try:
+            # Deflate streams end by themselves, the size only matters for stored data
+            remaining = None if has_descriptor and method == 8 else compressed_size
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == 8 else None
+            while remaining is None or remaining > 0:
+                data = reader.read1(ZIP_READ_SIZE if remaining is None else min(remaining, ZIP_READ_SIZE))
+                if not data:
+                    raise ValueError(f"Truncated zip entry: {name}")
+                if remaining is not None:
+                    remaining -= len(data)
+                while data:
+                    output = decompressor.decompress(data, CHUNK_SIZE) if decompressor else data
+                    # Past the end of the deflate stream the rest is left in unused_data
+                    data = decompressor.unconsumed_tail if decompressor and not decompressor.eof else b""
+                    running_crc = zlib.crc32(output, running_crc)
+                    if output_file:
+                        output_file.write(output)
+                if decompressor and decompressor.eof:
+                    reader.unread(len(decompressor.unused_data))
+                    break
+
+            if has_descriptor:
+                descriptor = reader.read(4)
+                if descriptor == b"PK\x07\x08":
+                    descriptor = reader.read(4)
+                crc = struct.unpack("<I", descriptor)[0]
+                reader.read(16 if zip64 else 8)
+            if running_crc != crc:
+                raise ValueError(f"CRC mismatch in zip entry: {name}")
+        finally:
+            if output_file:
+                output_file.close()
+        if output_file:
+            extracted += 1
+
+
+class Checksums:
+    """Running SHA-256, MD5 and/or CRC32 of data fed in pieces."""
+
+    def __init__(self, names=("sha256",)):
+        self.hashes = {name: hashlib.new(name) for name in names if name != "crc32"}
+        self.crc32 = 0 if "crc32" in names else None
+
+    def update(self, data):
+        for digest in self.hashes.values():
+            digest.update(data)
+        if self.crc32 is not None:
+            self.crc32 = zlib.crc32(data, self.crc32)
+
+    def hexdigests(self):
+        digests = {name: digest.hexdigest() for name, digest in self.hashes.items()}
+        if self.crc32 is not None:
+            digests["crc32"] = f"{self.crc32:08x}"
+        return digests
+
+
+def format_digests(digests):
+    return ", ".join(f"{name.upper()} {value}" for name, value in digests.items())
+
+
+def describe_output(decoded):
+    """One log line about a DecodedFile: its name, type and checksums, or what was unpacked."""
+    if decoded.file_type == "application/zip" and decoded.unpacked:
+        return f"{Path(decoded.path).name}/ ({decoded.file_type}, {decoded.unpacked} file(s) unpacked)"
+    stored = "already stored as " if decoded.duplicate else ""
+    gunzipped = "gunzipped, " if decoded.unpacked else ""
+    return f"{stored}{Path(decoded.path).name} ({gunzipped}{decoded.file_type}, {format_digests(decoded.digests)})"
+
+
+def stored_output(path, source_out, file_type, digests, dedupe):
+    """DecodedFile for a finished output file.
+
+    With dedupe the file is content-addressed: moved to <sha256>.<ext> next to source_out, or
+    dropped when that content is already stored there.
+    """
+    if not dedupe:
+        return DecodedFile(path, file_type, digests, False)
+    stored_path = str(Path(source_out).parent / f"{digests['sha256']}.{MIME_TO_EXTENSION.get(file_type, 'bin')}")
+    if Path(stored_path).exists():
+        Path(path).unlink()
+        return DecodedFile(stored_path, file_type, digests, True)
+    os.replace(path, stored_path)
+    return DecodedFile(stored_path, file_type, digests, False)
+
+
+def output_path(source_out, file_type, input_path=None):
+    """source_out.<ext> for the file type, or source_out.decoded.<ext> when that is the input file itself."""
+    extension = MIME_TO_EXTENSION.get(file_type, "bin")
+    path = f"{source_out}.{extension}"
+    if input_path and os.path.exists(path) and os.path.samefile(path, input_path):
+        path = f"{source_out}.decoded.{extension}"
+    return path
+
+
+def write_decoded(decoded_blocks, source_out, reserve=0, file_type=None, digests=("sha256",), dedupe=False,
+                  decompress=False, input_path=None):
+    """Detect the file type from the first decoded block and stream every block to source_out.<ext>.
+
+    reserve preallocates that many bytes, trimmed to the written length at the end. A known
+    file_type (a data: URI's declared one) skips the detection. The digests named are computed
+    on the way. With dedupe the output is stored content-addressed, as <sha256>.<ext> next to
+    source_out, and dropped if that file exists. With decompress a gzip stream is written
+    decompressed and a zip archive is extracted into the folder source_out, the compressed data
+    itself is never written. A half-written file is removed when decoding fails part way through.
+    input_path, the file being decoded, is never written over. Returns a DecodedFile.
+    """
+    # Only the start of the first block is needed to detect the type
+    first_block = next(decoded_blocks, b"")
+    file_type = file_type or sniff_mime(first_block)
+
+    if decompress and file_type == "application/gzip":
+        blocks = gunzip_blocks(itertools.chain([first_block], decoded_blocks))
+        return write_decoded(blocks, source_out, digests=digests, dedupe=dedupe,
+                             input_path=input_path)._replace(unpacked=1)
+    if decompress and file_type == "application/zip":
+        extracted = unzip_blocks(itertools.chain([first_block], decoded_blocks), source_out)
+        return DecodedFile(source_out, file_type, {}, False, extracted)
+
+    # Get the file extension based on the detected MIME type, default to 'bin' if unknown
+    output_file_path = output_path(source_out, file_type, input_path) + (".part" if dedupe else "")
+    checksums = Checksums(set(digests) | {"sha256"} if dedupe else digests)
+    try:
+        with open(output_file_path, "wb") as output_file:
+            if reserve:
+                output_file.truncate(reserve)
+            output_file.write(first_block)
+            checksums.update(first_block)
+            for block in decoded_blocks:
+                output_file.write(block)
+                checksums.update(block)
+            output_file.truncate()
+    except Exception:
+        if Path(output_file_path).exists():
+            Path(output_file_path).unlink()
+        raise
+    return stored_output(output_file_path, source_out, file_type, checksums.hexdigests(), dedupe)
+
+
+def decode_file(path, source_out, use_mmap=True, progress=None, digests=("sha256",), dedupe=False, decompress=False):
+    """Decode one base64 file to source_out.<ext>, from a memory map or in chunked reads.
+
+    progress is called with the number of input bytes consumed, digests, dedupe and decompress
+    are passed on to write_decoded. Returns a DecodedFile.
+    """
+    # mmap refuses empty files, and those have nothing to map anyway
+    if use_mmap and os.path.getsize(path) > 0:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            # Reserve the largest possible decoded size up front
+            return write_decoded(decode_mapped(mapped, progress=progress), source_out, len(mapped) // 4 * 3,
+                                 digests=digests, dedupe=dedupe, decompress=decompress, input_path=path)
+    with open(path, "rb") as file:
+        chunks = iter(lambda: file.read(CHUNK_SIZE), b"")
+        return write_decoded(decode_stream(track_progress(chunks, progress) if progress else chunks), source_out,
+                             digests=digests, dedupe=dedupe, decompress=decompress, input_path=path)
+
+
+def open_stream(path, mode):
+    """The file, or stdin/stdout for "-", which are left open."""
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin.buffer if "r" in mode else sys.stdout.buffer)
+    return open(path, mode)
+
+
+def read_chunks(stream):
+    return iter(lambda: stream.read(CHUNK_SIZE), b"")
+
+
+def write_blocks(blocks, output, unpack, checksums=None):
+    """Write decoded blocks to a stream, gunzipped when unpack is set and they are gzip, updating checksums."""
+    if unpack:
+        first_block = next(blocks, b"")
+        file_type = sniff_mime(first_block)
+        if file_type == "application/zip":
+            raise ValueError("A zip archive can only be unpacked into a folder, give one with -o")
+        blocks = itertools.chain([first_block], blocks)
+        if file_type == "application/gzip":
+            blocks = gunzip_blocks(blocks)
+    for block in blocks:
+        output.write(block)
+        if checksums:
+            checksums.update(block)
+    output.flush()
+
+
+def decode_command(args):
+    digests = ("sha256",) + (("md5",) if args.md5 else ()) + (("crc32",) if args.crc32 else ())
+    if args.output != "-":
+        if args.input == "-":
+            decoded = write_decoded(decode_stream(read_chunks(sys.stdin.buffer)), args.output, digests=digests,
+                                    dedupe=args.dedupe, decompress=args.unpack)
+        else:
+            decoded = decode_file(args.input, args.output, not args.no_mmap, None, digests, args.dedupe, args.unpack)
+        print(describe_output(decoded), file=sys.stderr)
+        return 0
+
+    # The data itself goes to stdout, so the checksums are only worked out and reported when asked for
+    checksums = Checksums(digests) if args.md5 or args.crc32 else None
+    with open_stream(args.input, "rb") as file:
+        # mmap refuses empty files and pipes, those are read in chunks
+        if args.input != "-" and not args.no_mmap and os.path.getsize(args.input) > 0:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                write_blocks(decode_mapped(mapped), sys.stdout.buffer, args.unpack, checksums)
+        else:
+            write_blocks(decode_stream(read_chunks(file)), sys.stdout.buffer, args.unpack, checksums)
+    if checksums:
+        print(format_digests(checksums.hexdigests()), file=sys.stderr)
+    return 0
+
+
+def encode_command(args):
+    line_length = MIME_LINE_LENGTH if args.wrap else 0
+    with open_stream(args.input, "rb") as file, open_stream(args.output, "wb") as output:
+        chunks = read_chunks(file)
+        if args.data_uri:
+            first_chunk = next(chunks, b"")
+            output.write(f"data:{sniff_mime(first_chunk)};base64,".encode("ascii"))
+            chunks = itertools.chain([first_chunk], chunks)
+        for text in encode_stream(chunks, line_length, args.urlsafe):
+            output.write(text)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream base64 to and from files, stdin and stdout.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    decode = commands.add_parser("decode", help="decode base64 text")
+    decode.add_argument("input", nargs="?", default="-", help="base64 text file, - for stdin (default)")
+    decode.add_argument("-o", "--output", default="-",
+                        help="output path without extension, the detected one is appended; - for stdout (default)")
+    decode.add_argument("--unpack", action="store_true",
+                        help="decompress gzip payloads, extract zip archives into the folder given with -o")
+    decode.add_argument("--md5", action="store_true", help="also report the MD5 of the output (on stderr)")
+    decode.add_argument("--crc32", action="store_true", help="also report the CRC32 of the output (on stderr)")
+    decode.add_argument("--dedupe", action="store_true",
+                        help="name the output by its SHA-256 and skip it when that file exists")
+    decode.add_argument("--no-mmap", action="store_true", help="read the input in chunks instead of mapping it")
+    decode.set_defaults(handler=decode_command)
+
+    encode = commands.add_parser("encode", help="encode a file to base64 text")
+    encode.add_argument("input", nargs="?", default="-", help="file to encode, - for stdin (default)")
+    encode.add_argument("-o", "--output", default="-", help="text file to write, - for stdout (default)")
+    encode.add_argument("--wrap", action="store_true", help=f"break lines every {MIME_LINE_LENGTH} characters")
+    encode.add_argument("--urlsafe", action="store_true", help="use - and _ instead of + and /")
+    encode.add_argument("--data-uri", action="store_true", help="prefix a data: URI header with the detected type")
+    encode.set_defaults(handler=encode_command)
+    args = parser.parse_args(argv)
+    if args.command == "decode" and args.dedupe and args.output == "-":
+        parser.error("--dedupe names an output file by its content, give the folder and name with -o")
+
+    try:
+        return args.handler(args)
+    except BrokenPipeError:
+        # The reader went away (| head); point stdout at devnull so the exit flush doesn't fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
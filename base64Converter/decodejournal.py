@@ -0,0 +1,59 @@
+import time
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inputs (
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    output TEXT,
+    error TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (path, size, mtime_ns)
+) WITHOUT ROWID;
+"""
+
+
+class DecodeJournal:
+    """SQLite record of the input files Watch Mode has decoded, so each is decoded once across restarts.
+
+    An input is keyed by (path, size, mtime_ns): a file rewritten under the same name is a new input.
+    claim() marks it started before the decode, finish() records the output or the error. Inputs still
+    started when the journal is opened were cut off by a crash or a quit; they are dropped so the next
+    folder scan claims them again, and decoding them again just rewrites the same output.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        with self.db:
+            self.interrupted = self.db.execute("DELETE FROM inputs WHERE state = 'started'").rowcount
+
+    def seen(self, key):
+        """Whether the input was claimed before, whatever came of it."""
+        return self.db.execute("SELECT 1 FROM inputs WHERE path = ? AND size = ? AND mtime_ns = ?", key).fetchone() is not None
+
+    def claim(self, key):
+        """Mark the input started. False when it already was, by this session or an earlier one."""
+        with self.db:
+            cursor = self.db.execute("INSERT OR IGNORE INTO inputs (path, size, mtime_ns, state, updated) "
+                                     "VALUES (?, ?, ?, 'started', ?)", (*key, time.time()))
+        return cursor.rowcount == 1
+
+    def finish(self, key, output=None, error=None):
+        with self.db:
+            self.db.execute("UPDATE inputs SET state = ?, output = ?, error = ?, updated = ? "
+                            "WHERE path = ? AND size = ? AND mtime_ns = ?",
+                            ("failed" if error else "done", output, error, time.time(), *key))
+
+    def release(self, key):
+        """Forget a claimed input that was never decoded, the next scan picks it up again."""
+        with self.db:
+            self.db.execute("DELETE FROM inputs WHERE path = ? AND size = ? AND mtime_ns = ?", key)
+
+    def close(self):
+        self.db.close()